@@ -0,0 +1,359 @@
+from types import SimpleNamespace
+import argparse
+import asyncio
+import io
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from nextcord import PartialEmoji, RawReactionActionEvent
+import nextcord
+
+import role_changer
+from rolechanger_model import RoleBinding
+from rolechanger_logging import StructuredFormatter, start_logging, stop_logging
+
+_emojis = ['😀', '😎', '🔥', '🎮', '🎵', '📚', '🎨', '⚽', '🍕', '🚀', '🌙', '⭐', '🐱', '🐶', '🌈', '💎']
+
+
+class FakeRest:
+    def __init__(self, latency: float, rate_limit_ratio: float, retry_after: float, rng: random.Random):
+        self.latency = latency
+        self.rate_limit_ratio = rate_limit_ratio
+        self.retry_after = retry_after
+        self.rng = rng
+        self.calls: dict[str, int] = {}
+        self.rate_limited = 0
+        self.in_flight = 0
+
+    async def request(self, route: str):
+        self.calls[route] = self.calls.get(route, 0) + 1
+        self.in_flight += 1
+        try:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            if self.rate_limit_ratio and self.rng.random() < self.rate_limit_ratio:
+                self.rate_limited += 1
+                response = SimpleNamespace(status=429, reason='Too Many Requests', headers={'Retry-After': str(self.retry_after)})
+                raise nextcord.HTTPException(response, 'You are being rate limited.')
+        finally:
+            self.in_flight -= 1
+
+
+class FakeRole:
+    def __init__(self, role_id: int, name: str, default: bool = False):
+        self.id = role_id
+        self.name = name
+        self.position = 1
+        self._default = default
+
+    def is_default(self) -> bool:
+        return self._default
+
+
+class FakeMember:
+    def __init__(self, member_id: int, guild: 'FakeGuild', bench: 'Benchmark'):
+        self.id = member_id
+        self.name = f'member-{member_id}'
+        self.guild = guild
+        self.roles = [guild.default_role]
+        self._bench = bench
+
+    async def edit(self, *, roles):
+        await self._bench.rest.request('PATCH /guilds/{guild_id}/members/{user_id}')
+        self.roles = [self.guild.default_role] + [self.guild.get_role(role.id) for role in roles]
+        self._bench.member_edited(self)
+
+    async def add_roles(self, *roles):
+        for role in roles:
+            await self._bench.rest.request('PUT /guilds/{guild_id}/members/{user_id}/roles/{role_id}')
+            if role not in self.roles:
+                self.roles.append(role)
+        self._bench.member_edited(self)
+
+    async def remove_roles(self, *roles):
+        for role in roles:
+            await self._bench.rest.request('DELETE /guilds/{guild_id}/members/{user_id}/roles/{role_id}')
+            if role in self.roles:
+                self.roles.remove(role)
+        self._bench.member_edited(self)
+
+
+class FakeGuild:
+    def __init__(self, guild_id: int, bench: 'Benchmark'):
+        self.id = guild_id
+        self.name = f'guild-{guild_id}'
+        self.default_role = FakeRole(guild_id, '@everyone', default=True)
+        self.roles: dict[int, FakeRole] = {}
+        self.members: dict[int, FakeMember] = {}
+        self._bench = bench
+
+    def get_role(self, role_id: int):
+        return self.roles.get(role_id)
+
+    def get_member(self, member_id: int):
+        if self._bench.args.member_cache == 'none':
+            return None
+        return self.members.get(member_id)
+
+    async def fetch_member(self, member_id: int):
+        await self._bench.rest.request('GET /guilds/{guild_id}/members/{user_id}')
+        return self.members.get(member_id) or self._bench.not_found()
+
+
+class FakeChannel:
+    def __init__(self, channel_id: int, guild: FakeGuild, bench: 'Benchmark'):
+        self.id = channel_id
+        self.name = f'channel-{channel_id}'
+        self.guild = guild
+        self._bench = bench
+
+    async def fetch_message(self, message_id: int):
+        await self._bench.rest.request('GET /channels/{channel_id}/messages/{message_id}')
+        return SimpleNamespace(id=message_id, channel=self, embeds=[])
+
+    def get_partial_message(self, message_id: int):
+        return SimpleNamespace(id=message_id, channel=self, remove_reaction=self._remove_reaction)
+
+    async def _remove_reaction(self, emoji, member):
+        await self._bench.rest.request('DELETE /channels/{channel_id}/messages/{message_id}/reactions/{emoji}/{user_id}')
+
+
+class FakeBot:
+    def __init__(self):
+        self.user = SimpleNamespace(id=1, name='bench-bot')
+        self.intents = nextcord.Intents.default()
+        self.guilds: dict[int, FakeGuild] = {}
+        self.channels: dict[int, FakeChannel] = {}
+
+    def get_guild(self, guild_id: int):
+        return self.guilds.get(guild_id)
+
+    def get_channel(self, channel_id: int):
+        return self.channels.get(channel_id)
+
+
+class Benchmark:
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.rest = FakeRest(args.rest_latency_ms / 1000, args.rate_limit_ratio, args.retry_after_ms / 1000, self.rng)
+        self.bot = FakeBot()
+        self.bot.intents.members = args.member_cache != 'none'
+        self.selectors: list[tuple[FakeGuild, FakeChannel, int, list[str]]] = []
+        self.bindings: set[tuple[int, str]] = set()
+        self.handler_latencies: list[float] = []
+        self.apply_latencies: list[float] = []
+        self._pending_events: dict[tuple[int, int], list[float]] = {}
+        self._next_id = 1000
+
+    def _snowflake(self) -> int:
+        self._next_id += 1
+        return self._next_id
+
+    def not_found(self):
+        raise nextcord.NotFound(SimpleNamespace(status=404, reason='Not Found'), 'Unknown Member')
+
+    def member_edited(self, member: FakeMember):
+        now = time.perf_counter()
+        for started in self._pending_events.pop((member.guild.id, member.id), []):
+            self.apply_latencies.append(now - started)
+
+    def _emote(self, index: int) -> PartialEmoji:
+        if index < len(_emojis):
+            return PartialEmoji(name=_emojis[index])
+        return PartialEmoji(name=f'bench{index}', id=900000 + index)
+
+    def build(self) -> dict:
+        args = self.args
+        data = {"guilds": []}
+        for _ in range(args.guilds):
+            guild = FakeGuild(self._snowflake(), self)
+            self.bot.guilds[guild.id] = guild
+            channel = FakeChannel(self._snowflake(), guild, self)
+            self.bot.channels[channel.id] = channel
+            for _ in range(args.members):
+                member = FakeMember(self._snowflake(), guild, self)
+                guild.members[member.id] = member
+
+            guild_data = {"guild_id": guild.id, "messages": []}
+            for _ in range(args.selectors):
+                message_id = self._snowflake()
+                emotes = []
+                msg = {"message_id": message_id, "channel_id": channel.id, "roles": []}
+                if args.mode != 'normal':
+                    msg["mode"] = args.mode
+                    msg["limit"] = args.limit if args.mode == 'limit' else 0
+                for index in range(args.emojis):
+                    role = FakeRole(self._snowflake(), f'role-{index}')
+                    guild.roles[role.id] = role
+                    emote = str(self._emote(index))
+                    emotes.append(emote)
+                    self.bindings.add((message_id, emote))
+                    msg["roles"].append({"role": role.id, "emote": emote, "description": f'Bench role {index}'})
+                guild_data["messages"].append(msg)
+                self.selectors.append((guild, channel, message_id, emotes))
+            data["guilds"].append(guild_data)
+        return data
+
+    def _event(self) -> tuple[RawReactionActionEvent, bool]:
+        guild, channel, message_id, _ = self.rng.choice(self.selectors)
+        if self.rng.random() >= self.args.tracked_ratio:
+            message_id = self._snowflake()
+        member_id = self.rng.choice(list(guild.members))
+        emoji = self._emote(self.rng.randrange(self.args.emojis))
+        is_add = self.rng.random() < self.args.add_ratio
+        event_type = 'REACTION_ADD' if is_add else 'REACTION_REMOVE'
+        payload = RawReactionActionEvent(
+            {"message_id": message_id, "channel_id": channel.id, "user_id": member_id, "guild_id": guild.id},
+            emoji,
+            event_type,
+        )
+        if is_add:
+            payload.member = guild.members[member_id]
+        return payload, is_add
+
+    async def _drain(self, cog: role_changer.ReactionRoles):
+        while cog._pending_edits or cog.queue.depth or self.rest.in_flight:
+            await asyncio.sleep(0.01)
+
+    async def run(self) -> dict:
+        args = self.args
+        cog = role_changer.ReactionRoles(self.bot)
+        events = [self._event() for _ in range(args.events)]
+        interval = 1 / args.rate if args.rate else 0
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        for payload, is_add in events:
+            event_started = time.perf_counter()
+            if (payload.message_id, str(payload.emoji)) in self.bindings:
+                self._pending_events.setdefault((payload.guild_id, payload.user_id), []).append(event_started)
+            await cog.change_reaction_role(payload=payload, is_add=is_add)
+            self.handler_latencies.append(time.perf_counter() - event_started)
+            if interval:
+                await asyncio.sleep(interval)
+            else:
+                await asyncio.sleep(0)
+        dispatched = time.perf_counter() - started
+        await self._drain(cog)
+        elapsed = time.perf_counter() - started
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        save_durations = []
+        guild_config = await cog._get_guild(self.selectors[0][0].id)
+        msg = guild_config.messages[self.selectors[0][2]]
+        for index in range(args.save_iterations):
+            cog._add_bindings(guild_config, msg, [RoleBinding(self._snowflake(), f'save{index}', 'Bench save')])
+            save_started = time.perf_counter()
+            await cog.flush_config()
+            save_durations.append(time.perf_counter() - save_started)
+
+        queue_stats = cog.queue.snapshot()
+        guild_cache = cog.guilds.snapshot()
+        members = cog.members.snapshot()
+        cog.cog_unload()
+
+        rest_calls = sum(self.rest.calls.values())
+        return {
+            "parameters": vars(args),
+            "events": args.events,
+            "elapsed_seconds": elapsed,
+            "dispatch_seconds": dispatched,
+            "events_per_second": args.events / elapsed if elapsed else 0.0,
+            "handler_latency_ms": _percentiles(self.handler_latencies),
+            "apply_latency_ms": _percentiles(self.apply_latencies),
+            "rest_calls": rest_calls,
+            "rest_calls_per_event": rest_calls / args.events if args.events else 0.0,
+            "rest_calls_by_route": self.rest.calls,
+            "rate_limited": self.rest.rate_limited,
+            "peak_memory_bytes": peak_memory,
+            "save_ms": _percentiles(save_durations),
+            "config_bytes": os.path.getsize(role_changer._config) if os.path.exists(role_changer._config) else 0,
+            "edit_stats": cog.edit_stats,
+            "queue": queue_stats,
+            "guild_cache": guild_cache,
+            "members": members,
+        }
+
+
+def _percentiles(samples: list[float]) -> dict:
+    if not samples:
+        return {"count": 0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    ordered = sorted(samples)
+
+    def pick(fraction: float) -> float:
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000
+
+    return {"count": len(ordered), "p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "max": ordered[-1] * 1000}
+
+
+def _parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Offline load test for the rolechanger reaction pipeline.')
+    parser.add_argument('--guilds', type=int, default=10)
+    parser.add_argument('--selectors', type=int, default=3, help='Selector messages per guild.')
+    parser.add_argument('--emojis', type=int, default=5, help='Emoji bindings per selector.')
+    parser.add_argument('--members', type=int, default=200, help='Members per guild.')
+    parser.add_argument('--events', type=int, default=5000)
+    parser.add_argument('--tracked-ratio', type=float, default=0.2, help='Share of events that hit a selector message.')
+    parser.add_argument('--add-ratio', type=float, default=0.7, help='Share of events that are reaction adds.')
+    parser.add_argument('--mode', choices=list(role_changer._selector_modes), default='normal', help='Selector mode of every generated selector.')
+    parser.add_argument('--limit', type=int, default=2, help='Role limit for the limit mode.')
+    parser.add_argument('--rate', type=float, default=0, help='Events per second to replay, 0 for as fast as possible.')
+    parser.add_argument('--rest-latency-ms', type=float, default=50)
+    parser.add_argument('--rate-limit-ratio', type=float, default=0.0, help='Share of REST calls answered with a 429.')
+    parser.add_argument('--retry-after-ms', type=float, default=100)
+    parser.add_argument('--role-edit-window-ms', type=float, default=role_changer._role_edit_window * 1000)
+    parser.add_argument('--workers', type=int, default=role_changer._queue_workers)
+    parser.add_argument('--backend', choices=['json', 'sqlite'], default=role_changer._storage_backend)
+    parser.add_argument('--guild-cache-kb', type=float, default=role_changer._guild_cache_budget / 1024, help='Memory budget for loaded guild configurations.')
+    parser.add_argument('--member-cache', choices=['full', 'none'], default='full', help='Whether guild.get_member finds members, like a bot with or without the member cache.')
+    parser.add_argument('--save-iterations', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> dict:
+    args = _parse_args(sys.argv[1:] if argv is None else argv)
+    output = os.path.abspath(args.output) if args.output else None
+
+    role_changer._role_edit_window = args.role_edit_window_ms / 1000
+    role_changer._queue_workers = args.workers
+    role_changer._storage_backend = args.backend
+    role_changer._guild_cache_budget = int(args.guild_cache_kb * 1024)
+
+    working_directory = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='rolechanger-bench-') as directory:
+        os.chdir(directory)
+        try:
+            bench = Benchmark(args)
+            with open(role_changer._config, 'w', encoding='utf-8') as file:
+                json.dump(bench.build(), file, ensure_ascii=False)
+            handler = logging.StreamHandler(io.StringIO())
+            handler.setFormatter(StructuredFormatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+            start_logging(role_changer._log_levels, sample_rate=role_changer._log_sample_rate, sample_burst=role_changer._log_sample_burst, handlers=[handler])
+            try:
+                report = asyncio.run(bench.run())
+            finally:
+                stop_logging()
+        finally:
+            os.chdir(working_directory)
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if output:
+        with open(output, 'w', encoding='utf-8') as file:
+            file.write(text)
+    else:
+        print(text)
+    return report
+
+
+if __name__ == '__main__':
+    main()
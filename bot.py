@@ -4,11 +4,32 @@ import os
 
 
 intents = nextcord.Intents.default()
-intents.members = True    
+intents.members = os.environ.get('ROLECHANGER_MEMBERS_INTENT', '1') != '0'
 intents.reactions = True    
 intents.message_content = True 
 
-bot = commands.Bot(intents=intents)
+# full: cache and chunk every member, lazy: only cache members seen in events, none: cache no members.
+member_cache = os.environ.get('ROLECHANGER_MEMBER_CACHE', 'full')
+cache_options = {}
+if member_cache == 'lazy':
+    cache_options = {"member_cache_flags": nextcord.MemberCacheFlags.from_intents(intents), "chunk_guilds_at_startup": False}
+elif member_cache == 'none':
+    cache_options = {"member_cache_flags": nextcord.MemberCacheFlags.none(), "chunk_guilds_at_startup": False}
+
+shard_count = os.environ.get('ROLECHANGER_SHARD_COUNT')
+shard_ids = os.environ.get('ROLECHANGER_SHARD_IDS')
+
+if shard_count:
+    bot = commands.AutoShardedBot(
+        intents=intents,
+        **cache_options,
+        shard_count=int(shard_count),
+        shard_ids=[int(shard_id) for shard_id in shard_ids.split(',')] if shard_ids else None
+    )
+elif os.environ.get('ROLECHANGER_AUTOSHARD'):
+    bot = commands.AutoShardedBot(intents=intents, **cache_options)
+else:
+    bot = commands.Bot(intents=intents, **cache_options)
 
 @bot.event
 async def on_ready():
@@ -16,4 +37,4 @@ async def on_ready():
 bot.load_extension('role_changer')
 
 print(f"A connection is being established with the bot.")
-bot.run('your token')
\ No newline at end of file
+bot.run(os.environ.get('DISCORD_TOKEN', 'your token'))
\ No newline at end of file
@@ -0,0 +1,102 @@
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+
+
+def shard_ranges(shard_count: int, processes: int) -> list[list[int]]:
+    processes = max(1, min(processes, shard_count))
+    size, extra = divmod(shard_count, processes)
+    ranges, start = [], 0
+    for index in range(processes):
+        end = start + size + (1 if index < extra else 0)
+        ranges.append(list(range(start, end)))
+        start = end
+    return ranges
+
+
+class Worker:
+    def __init__(self, index: int, shard_ids: list[int], shard_count: int, script: str):
+        self.index = index
+        self.shard_ids = shard_ids
+        self.shard_count = shard_count
+        self.script = script
+        self.process: subprocess.Popen | None = None
+        self.started_at = 0.0
+        self.restart_delay = 0.0
+        self.restart_at = 0.0
+
+    def start(self):
+        env = dict(os.environ)
+        env['ROLECHANGER_SHARD_COUNT'] = str(self.shard_count)
+        env['ROLECHANGER_SHARD_IDS'] = ','.join(map(str, self.shard_ids))
+        self.process = subprocess.Popen([sys.executable, self.script], env=env)
+        self.started_at = time.monotonic()
+        print(f'Worker {self.index} started with shards {self.shard_ids[0]}-{self.shard_ids[-1]} (PID {self.process.pid}).')
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description='Runs the bot as several processes, each owning a range of shards.')
+    parser.add_argument('--shards', type=int, required=True, help='Total shard count.')
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--script', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bot.py'))
+    parser.add_argument('--identify-delay', type=float, default=5.0, help='Seconds to wait per shard before starting the next worker.')
+    parser.add_argument('--restart-delay', type=float, default=5.0)
+    parser.add_argument('--max-restart-delay', type=float, default=300.0)
+    parser.add_argument('--stable-after', type=float, default=60.0, help='Seconds a worker must run before its restart delay resets.')
+    args = parser.parse_args(argv)
+
+    workers = [Worker(index, shard_ids, args.shards, args.script) for index, shard_ids in enumerate(shard_ranges(args.shards, args.processes))]
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for worker in workers:
+        if stopping:
+            break
+        worker.start()
+        deadline = time.monotonic() + args.identify_delay * len(worker.shard_ids)
+        while not stopping and time.monotonic() < deadline:
+            time.sleep(0.5)
+
+    while not stopping:
+        now = time.monotonic()
+        for worker in workers:
+            if worker.process is None:
+                if now >= worker.restart_at:
+                    worker.start()
+                continue
+
+            code = worker.process.poll()
+            if code is None:
+                continue
+
+            if now - worker.started_at >= args.stable_after:
+                worker.restart_delay = 0.0
+            worker.restart_delay = min(args.max_restart_delay, worker.restart_delay * 2 or args.restart_delay)
+            worker.restart_at = now + worker.restart_delay
+            worker.process = None
+            print(f'Worker {worker.index} exited with code {code}. Restarting in {worker.restart_delay:.0f} seconds.')
+        time.sleep(1)
+
+    print('Stopping workers.')
+    running = [worker.process for worker in workers if worker.process is not None and worker.process.poll() is None]
+    for process in running:
+        process.send_signal(signal.SIGINT)
+    deadline = time.monotonic() + 30
+    for process in running:
+        try:
+            process.wait(timeout=max(0.0, deadline - time.monotonic()))
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,50 +1,320 @@
-from nextcord import Permissions, slash_command, RawReactionActionEvent, Interaction, Role, Message, Embed
+from nextcord import Permissions, slash_command, RawReactionActionEvent, Interaction, Role, Message, Embed, SlashOption
 from nextcord.ext import commands
 import nextcord
+import asyncio
+import io
 import json
+import logging
+import os
+import re
+import time
+import unicodedata
+from rolechanger_storage import Storage, UnshardedJsonStorage, ShardedJsonStorage, SqliteStorage
+from rolechanger_model import GuildCache, GuildConfig, RoleBinding, SelectorMessage
+from rolechanger_members import MemberResolver
+from rolechanger_queue import RoleChangeQueue
+from rolechanger_metrics import Metrics
+from rolechanger_logging import start_logging, stop_logging
+from rolechanger_reconcile import Reconciler
+from rolechanger_prune import Pruner
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+log = logging.getLogger('rolechanger')
+reaction_log = logging.getLogger('rolechanger.reactions')
+command_log = logging.getLogger('rolechanger.commands')
 
 _config = 'rolechanger_conf.json'
+_database = 'rolechanger.db'
+_storage_backend = 'json'
+_save_delay = 2.0
+_guild_cache_budget = 32 * 1024 * 1024
+_render_delay = 1.0
+_member_cache_size = 5000
+_member_cache_ttl = 300.0
+_member_negative_ttl = 60.0
+_role_edit_window = 0.5
+_role_edit_max_delay = 2.0
+_queue_workers = 4
+_queue_max_size = 10000
+_queue_guild_max_size = 1000
+_queue_max_deferrals = 3
+_metrics_host = '127.0.0.1'
+_metrics_port: int | None = None
+_log_levels = {
+    'rolechanger': logging.INFO,
+    'rolechanger.reactions': logging.INFO,
+    'rolechanger.commands': logging.INFO,
+    'rolechanger.queue': logging.INFO,
+    'rolechanger.storage': logging.INFO,
+}
+_log_sample_rate = 5.0
+_reaction_seed_concurrency = 3
+_reconcile_checkpoint = 'rolechanger_reconcile.json'
+_reconcile_concurrency = 4
+_reconcile_remove_stale = False
+_prune_audit_interval = 6 * 3600.0
+_prune_audit_pause = 0.5
+_import_max_bytes = 1_000_000
+_selector_modes = {
+    "normal": "Add the reaction to get the role, remove it to drop the role.",
+    "unique": "You can only have one role from this message.",
+    "limit": "You can have at most {limit} roles from this message.",
+    "verify": "Roles are only added, removing the reaction keeps the role.",
+    "remove": "React to remove the role.",
+}
+_selector_kinds = ("reaction", "button", "select")
+_component_prefix = 'rolechanger:'
+_component_limit = 25
+_reaction_limit = 20
+_custom_emoji = re.compile(r'^<a?:\w{2,32}:(\d{15,21})>$')
+_emoji_joiners = '\u200d\ufe0e\ufe0f\u20e3'
+_emoji_punctuation = '\u203c\u2049\u2139\u3030\u303d'
+_role_spec = re.compile(r'^\s*(\S+)\s+<@&(\d+)>\s*(.*?)\s*$')
+_log_sample_burst = 20
+
+def _shard_layout(bot) -> tuple[list[int] | None, int | None]:
+    shard_count = getattr(bot, 'shard_count', None)
+    if not shard_count or shard_count <= 1:
+        return None, None
+
+    shard_ids = getattr(bot, 'shard_ids', None)
+    if shard_ids is None and getattr(bot, 'shard_id', None) is not None:
+        shard_ids = [bot.shard_id]
+    return sorted(shard_ids) if shard_ids is not None else list(range(shard_count)), shard_count
+
+def _create_storage(bot) -> Storage:
+    shard_ids, shard_count = _shard_layout(bot)
+    if _storage_backend == 'sqlite':
+        return SqliteStorage(_database, import_from=_config, shard_ids=shard_ids, shard_count=shard_count)
+    if shard_count:
+        return ShardedJsonStorage(_config, shard_ids, shard_count, save_delay=_save_delay)
+    return UnshardedJsonStorage(_config, save_delay=_save_delay)
+
+def _partition_path(path: str, bot) -> str:
+    shard_ids, shard_count = _shard_layout(bot)
+    if not shard_count:
+        return path
+    base, extension = os.path.splitext(path)
+    return f'{base}.shards{shard_ids[0]}-{shard_ids[-1]}-of-{shard_count}{extension}'
+
+def _is_unicode_emoji(emote: str) -> bool:
+    if not emote or len(emote) > 16 or emote.isascii():
+        return False
+    if emote[-1] == '\u20e3':
+        return emote[0] in '#*0123456789' and emote[1:-1] in ('', '\ufe0f')
+    bases = 0
+    for char in emote:
+        if char == '\u200d':
+            bases = 0
+        elif char in _emoji_joiners or '\U0001f3fb' <= char <= '\U0001f3ff' or '\U000e0020' <= char <= '\U000e007f':
+            continue
+        elif char.isascii() or (char not in _emoji_punctuation and unicodedata.category(char) not in ('So', 'Sm')):
+            return False
+        else:
+            bases += 1
+            if bases > (2 if '\U0001f1e6' <= char <= '\U0001f1ff' else 1):
+                return False
+    return bases > 0
+
+def _embed_signature(embed: dict) -> tuple:
+    return (
+        embed.get("title") or None,
+        embed.get("description") or None,
+        embed.get("color"),
+        tuple((field.get("name"), field.get("value")) for field in embed.get("fields", [])),
+        (embed.get("footer") or {}).get("text"),
+    )
 
 class ReactionRoles(commands.Cog):
     def __init__(self, bot):
         self.bot: commands.Bot = bot
-        self.data = {"guilds": []}
+        self.guilds = GuildCache(_guild_cache_budget)
+        self._message_guilds: dict[int, int] = {}
+        self._guild_selectors: dict[int, int] = {}
+        self._guild_loads: dict[int, asyncio.Future] = {}
+        self._pending_edits: dict[tuple[int, int], dict] = {}
+        self._edits_in_flight: dict[tuple[int, int], int] = {}
+        self.render_stats = {"requested": 0, "renders": 0, "adopted": 0, "drift": 0, "failed": 0}
+        self._renders: dict[int, asyncio.Task] = {}
+        self._drifted: dict[int, tuple] = {}
+        self.members = MemberResolver(max_size=_member_cache_size, ttl=_member_cache_ttl, negative_ttl=_member_negative_ttl, rest=self._rest)
+        self.edit_stats = {"role_changes": 0, "member_edits": 0, "cancelled": 0, "calls_saved": 0, "deferred": 0, "shed": 0, "rejected": 0, "reactions_removed": 0}
+        self.queue = RoleChangeQueue(worker_count=_queue_workers, max_size=_queue_max_size, guild_max_size=_queue_guild_max_size)
+        self.metrics = Metrics()
+        self.metrics.collectors.append(self._collect_metrics)
+        self.storage: Storage = _create_storage(bot)
+        self.storage.metrics = self.metrics
+        self.reconciler = Reconciler(self, checkpoint_path=_partition_path(_reconcile_checkpoint, bot), concurrency=_reconcile_concurrency, remove_stale=_reconcile_remove_stale)
+        self.pruner = Pruner(self, interval=_prune_audit_interval, pause=_prune_audit_pause)
         self._load_config()
 
+    def cog_unload(self):
+        for task in self._renders.values():
+            task.cancel()
+        self.reconciler.stop()
+        self.pruner.stop()
+        self.metrics.stop_server()
+        self.queue.stop()
+        self.storage.close()
+
+    async def cog_application_command_before_invoke(self, interaction: Interaction):
+        interaction.attached["rolechanger_started"] = time.perf_counter()
+        if interaction.guild_id:
+            self.guilds.pin(interaction.guild_id)
+
+    async def cog_application_command_after_invoke(self, interaction: Interaction):
+        if interaction.guild_id:
+            self.guilds.unpin(interaction.guild_id)
+        started = interaction.attached.get("rolechanger_started")
+        if started is not None and interaction.application_command:
+            self.metrics.observe('rolechanger_command_seconds', time.perf_counter() - started, command=interaction.application_command.qualified_name)
+
+    def _collect_metrics(self) -> dict[str, float]:
+        values = {f'rolechanger_queue_{key}': value for key, value in self.queue.snapshot().items()}
+        values.update({f'rolechanger_edits_{key}': value for key, value in self.edit_stats.items()})
+        values.update({f'rolechanger_reconcile_{key}': value for key, value in self.reconciler.stats.items()})
+        values['rolechanger_pending_members'] = len(self._pending_edits)
+        values.update({f'rolechanger_guild_cache_{key}': value for key, value in self.guilds.snapshot().items()})
+        values.update({f'rolechanger_members_{key}': value for key, value in self.members.snapshot().items()})
+        values.update({f'rolechanger_renders_{key}': value for key, value in self.render_stats.items()})
+        values.update({f'rolechanger_pruned_{key}': value for key, value in self.pruner.stats.items()})
+        values['rolechanger_indexed_messages'] = len(self._message_guilds)
+        values['rolechanger_indexed_guilds'] = len(self._guild_selectors)
+        return values
+
+    def _rest(self, route: str):
+        self.metrics.inc('rolechanger_rest_calls_total', route=route)
+
     def _load_config(self):
-        try:
-            with open(_config, 'r', encoding='utf-8') as file:
-                self.data = json.load(file)
-            print(f'The configuration file ({_config}) was loaded successfully.')
-        except FileNotFoundError:
-            print(f'Configuration file ({_config}) not found. Creating new file.')
-            self.data = {"guilds": []}
-            self._save_config()
-        except json.JSONDecodeError:
-            print(f'Could not read configuration file ({_config}) (unformatted). Continuing with empty data.')
-            self.data = {"guilds": []}
-            self._save_config()
-    
-    def _save_config(self):
-        try:
-            with open(_config, 'w', encoding='utf-8') as file:
-                json.dump(self.data, file, indent=4, ensure_ascii=False)
-            print(f'The configuration file ({_config}) has been saved.')
-        except Exception as e:
-            print(f'Failed to save configuration file: {e}')
+        self.guilds.clear()
+        self._message_guilds = self.storage.load_index()
+        self._guild_selectors = {}
+        for guild_id in self._message_guilds.values():
+            self._guild_selectors[guild_id] = self._guild_selectors.get(guild_id, 0) + 1
 
-    def _get_guild_data(self, guild_id: int, create_if_missing: bool = False) -> dict | None:
-        for guild_data in self.data.get("guilds", []):
-            if guild_data.get("guild_id") == guild_id:
-                return guild_data
-        
-        if create_if_missing:
-            new_data = {"guild_id": guild_id, "messages": []}
-            self.data["guilds"].append(new_data)
-            self._save_config()
-            return new_data
-        
-        return None
+    def _index_message(self, message_id: int, guild_id: int):
+        if message_id not in self._message_guilds:
+            self._guild_selectors[guild_id] = self._guild_selectors.get(guild_id, 0) + 1
+        self._message_guilds[message_id] = guild_id
+
+    def _unindex_message(self, message_id: int):
+        guild_id = self._message_guilds.pop(message_id, None)
+        if guild_id is None:
+            return
+        count = self._guild_selectors.pop(guild_id, 0) - 1
+        if count > 0:
+            self._guild_selectors[guild_id] = count
+
+    async def flush_config(self):
+        await self.storage.flush()
+
+    async def _get_guild(self, guild_id: int, create_if_missing: bool = False) -> GuildConfig | None:
+        guild = self.guilds.get(guild_id)
+        if guild is None:
+            loading = self._guild_loads.get(guild_id)
+            if loading is None:
+                loading = self._guild_loads[guild_id] = asyncio.ensure_future(self._load_guild(guild_id))
+                loading.add_done_callback(lambda _: self._guild_loads.pop(guild_id, None))
+            guild = await asyncio.shield(loading)
+
+        if guild is None and create_if_missing:
+            guild = self.guilds.get(guild_id)
+            if guild is None:
+                guild = GuildConfig(guild_id)
+                self.guilds.put(guild)
+                self.storage.guild_added(guild)
+        return guild
+
+    async def _load_guild(self, guild_id: int) -> GuildConfig | None:
+        started = time.perf_counter()
+        guild = await self.storage.load_guild(guild_id)
+        self.metrics.observe('rolechanger_stage_seconds', time.perf_counter() - started, stage='guild_load')
+        if guild_id in self.guilds:
+            return self.guilds.get(guild_id)
+        if guild is not None:
+            self.guilds.put(guild)
+        return guild
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        if _metrics_port:
+            shard_ids, _ = _shard_layout(self.bot)
+            port = _metrics_port + (shard_ids[0] if shard_ids else 0)
+            try:
+                await self.metrics.start_server(_metrics_host, port)
+            except OSError as e:
+                log.error('Could not start the metrics endpoint on %s:%s: %s', _metrics_host, port, e)
+        self.reconciler.start()
+        self.pruner.start()
+
+    @commands.Cog.listener()
+    async def on_close(self):
+        await self.flush_config()
+
+    @commands.Cog.listener()
+    async def on_raw_member_remove(self, payload: nextcord.RawMemberRemoveEvent):
+        self.members.forget(payload.guild_id, payload.user.id, missing=True)
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member: nextcord.Member):
+        self.members.forget(member.guild.id, member.id)
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload: nextcord.RawMessageDeleteEvent):
+        if payload.guild_id and payload.message_id in self._message_guilds:
+            await self.pruner.prune_messages(payload.guild_id, [payload.message_id])
+
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload: nextcord.RawBulkMessageDeleteEvent):
+        message_ids = [message_id for message_id in payload.message_ids if message_id in self._message_guilds]
+        if payload.guild_id and message_ids:
+            await self.pruner.prune_messages(payload.guild_id, message_ids)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel: nextcord.abc.GuildChannel):
+        await self.pruner.prune_channel(channel.guild.id, channel.id)
+
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role: Role):
+        await self.pruner.prune_role(role.guild.id, role.id)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild: nextcord.Guild):
+        await self.pruner.prune_guild(guild.id)
+
+    @commands.Cog.listener()
+    async def on_raw_message_edit(self, payload: nextcord.RawMessageUpdateEvent):
+        guild_id = self._message_guilds.get(payload.message_id)
+        embeds = payload.data.get("embeds")
+        if guild_id is None or embeds is None or payload.message_id in self._renders:
+            return
+
+        guild_config = await self._get_guild(guild_id)
+        msg = guild_config.messages.get(payload.message_id) if guild_config else None
+        if msg is None:
+            return
+        if not msg.has_embed:
+            if embeds:
+                self._adopt_embed(guild_config, msg, embeds[0])
+            return
+
+        seen = _embed_signature(embeds[0] if embeds else {})
+        if seen == _embed_signature(self._render_embed(self.bot.get_guild(guild_id), msg).to_dict()):
+            self._drifted.pop(msg.message_id, None)
+        elif self._drifted.get(msg.message_id) != seen:
+            self._drifted[msg.message_id] = seen
+            self.render_stats["drift"] += 1
+            command_log.warning('The selector message was edited outside the bot, rendering it again.', extra={"guild_id": guild_id, "message_id": msg.message_id, "action": "render"})
+            self._render_later(guild_id, msg)
 
     @commands.Cog.listener()
     async def on_raw_reaction_add(self, payload: RawReactionActionEvent):
@@ -54,111 +324,632 @@ class ReactionRoles(commands.Cog):
     async def on_raw_reaction_remove(self, payload: RawReactionActionEvent):
         await self.change_reaction_role(payload=payload, is_add=False)
 
+    @commands.Cog.listener()
+    async def on_interaction(self, interaction: Interaction):
+        if interaction.type == nextcord.InteractionType.component and interaction.data.get("custom_id", "").startswith(_component_prefix):
+            await self.change_component_role(interaction)
+
     @slash_command(name='rolechanger', description='Commands for users to select a role with a message.', default_member_permissions=Permissions(administrator=True))
     async def rolechanger(self, interaction: Interaction):
         pass
 
     async def change_reaction_role(self, payload: RawReactionActionEvent, is_add: bool):
-        if payload.user_id == self.bot.user.id or not payload.guild_id:
+        metrics = self.metrics
+        metrics.inc('rolechanger_events_total', result='seen')
+        if not payload.guild_id or payload.user_id == self.bot.user.id:
+            metrics.inc('rolechanger_events_total', result='ignored')
             return
 
+        if self._message_guilds.get(payload.message_id) != payload.guild_id:
+            metrics.inc('rolechanger_events_total', result='ignored')
+            return
+
+        guild_config = self.guilds.get(payload.guild_id) or await self._get_guild(payload.guild_id)
+        msg = guild_config.messages.get(payload.message_id) if guild_config else None
+        binding = msg.bindings.get(str(payload.emoji)) if msg and msg.kind == "reaction" else None
+        if binding is None or (not is_add and msg.mode in ("verify", "remove")):
+            metrics.inc('rolechanger_events_total', result='ignored')
+            return
+        metrics.inc('rolechanger_events_total', result='matched')
+
+        started = time.perf_counter()
         guild = self.bot.get_guild(payload.guild_id)
         if not guild:
             return
+        metrics.observe('rolechanger_stage_seconds', time.perf_counter() - started, stage='guild_lookup')
 
-        guild_data = self._get_guild_data(guild.id)
-        if not guild_data:
+        started = time.perf_counter()
+        user = await self.members.resolve(guild, payload.user_id, payload.member)
+        if user is None:
+            reaction_log.warning('No user found on server %s.', guild.name, extra={"guild_id": guild.id, "message_id": payload.message_id, "user_id": payload.user_id, "action": "resolve_member"})
             return
+        metrics.observe('rolechanger_stage_seconds', time.perf_counter() - started, stage='member_resolve')
 
-        channel = self.bot.get_channel(payload.channel_id)
-        if not channel:
+        self._queue_role_change(guild, user, binding.role_id, is_add and msg.mode != "remove", msg)
+
+    async def change_component_role(self, interaction: Interaction):
+        metrics = self.metrics
+        metrics.inc('rolechanger_events_total', result='seen')
+        message_id = interaction.message.id if interaction.message else None
+        guild_config = None
+        if interaction.guild_id and self._message_guilds.get(message_id) == interaction.guild_id:
+            guild_config = self.guilds.get(interaction.guild_id) or await self._get_guild(interaction.guild_id)
+        msg = guild_config.messages.get(message_id) if guild_config else None
+        if msg is None or msg.kind == "reaction" or not isinstance(interaction.user, nextcord.Member):
+            metrics.inc('rolechanger_events_total', result='ignored')
+            await interaction.response.send_message("This role selector is no longer active.", ephemeral=True)
+            return
+
+        member: nextcord.Member = interaction.user
+        custom_id = interaction.data["custom_id"]
+        changes: dict[int, tuple[bool, SelectorMessage]] = {}
+        if msg.kind == "select":
+            chosen = set(interaction.data.get("values", []))
+            if msg.mode == "remove":
+                changes.update((binding.role_id, (False, msg)) for emote, binding in msg.bindings.items() if emote in chosen)
+            else:
+                if msg.mode != "verify":
+                    changes.update((binding.role_id, (False, msg)) for emote, binding in msg.bindings.items() if emote not in chosen)
+                changes.update((binding.role_id, (True, msg)) for emote, binding in msg.bindings.items() if emote in chosen)
+        else:
+            binding = msg.bindings.get(custom_id[len(_component_prefix):])
+            if binding is not None:
+                has_role = member.get_role(binding.role_id) is not None
+                if msg.mode == "remove" or (has_role and msg.mode != "verify"):
+                    changes[binding.role_id] = (False, msg)
+                elif not has_role:
+                    changes[binding.role_id] = (True, msg)
+
+        if not changes:
+            metrics.inc('rolechanger_events_total', result='ignored')
+            await interaction.response.send_message("Your roles are already up to date.", ephemeral=True)
             return
+        metrics.inc('rolechanger_events_total', result='matched')
+
+        current, target, _, rejected = self._plan_roles(member, changes)
+        for role_id, (is_add, _) in changes.items():
+            if role_id not in rejected:
+                self._queue_role_change(member.guild, member, role_id, is_add and msg.mode != "remove", msg)
 
+        added, removed = target - current, current - target
+        lines = []
+        if added:
+            lines.append(f"✅ Added: **{self._role_names(member.guild, added)}**")
+        if removed:
+            lines.append(f"➖ Removed: **{self._role_names(member.guild, removed)}**")
+        if rejected:
+            lines.append(f"⚠️ {_selector_modes['limit'].format(limit=msg.limit)}")
         try:
-            message: Message = await channel.fetch_message(payload.message_id)
-        except nextcord.NotFound:
-            print(f'No message found. Message ID: {payload.message_id}')
+            await interaction.response.send_message("\n".join(lines) or "Your roles are already up to date.", ephemeral=True)
+        except nextcord.HTTPException as e:
+            reaction_log.warning('Could not answer a selector interaction: %s', e, extra={"guild_id": member.guild.id, "message_id": message_id, "user_id": member.id, "action": "respond"})
+
+    def _queue_role_change(self, guild: nextcord.Guild, member: nextcord.Member, role_id: int, is_add: bool, msg: SelectorMessage | None = None):
+        loop = asyncio.get_running_loop()
+        key = (guild.id, member.id)
+        pending = self._pending_edits.get(key)
+        if pending is None:
+            pending = self._pending_edits[key] = {"member": member, "roles": {}, "first": loop.time(), "last": 0.0, "deferred": 0}
+            loop.create_task(self._flush_member_later(key))
+
+        pending["member"] = member
+        pending["roles"].pop(role_id, None)
+        pending["roles"][role_id] = (is_add, msg)
+        pending["last"] = loop.time()
+        self.edit_stats["role_changes"] += 1
+
+    async def _flush_member_later(self, key: tuple[int, int]):
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = self._pending_edits[key]
+            delay = min(pending["last"] + _role_edit_window, pending["first"] + _role_edit_max_delay) - loop.time()
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+
+        while not self.queue.put(key[0], lambda: self._apply_member_edit(key)):
+            pending = self._pending_edits[key]
+            if pending["deferred"] >= _queue_max_deferrals:
+                del self._pending_edits[key]
+                self.edit_stats["shed"] += len(pending["roles"])
+                reaction_log.error('Role change queue is full, dropped the pending role changes.', extra={"guild_id": key[0], "user_id": key[1], "action": "shed"})
+                return
+            pending["deferred"] += 1
+            self.edit_stats["deferred"] += 1
+            await asyncio.sleep(_role_edit_max_delay)
+
+    async def _apply_member_edit(self, key: tuple[int, int]):
+        self._edits_in_flight[key] = self._edits_in_flight.get(key, 0) + 1
+        try:
+            await self._apply_pending_edit(key)
+        finally:
+            self._edits_in_flight[key] -= 1
+            if not self._edits_in_flight[key]:
+                del self._edits_in_flight[key]
+
+    def _edit_outstanding(self, key: tuple[int, int]) -> bool:
+        return key in self._pending_edits or key in self._edits_in_flight
+
+    async def _apply_pending_edit(self, key: tuple[int, int]):
+        pending = self._pending_edits.pop(key, None)
+        if pending is None:
             return
-        except Exception as e:
-            print(f'Error receiving message: {e}')
+        member: nextcord.Member = pending["member"]
+        guild = member.guild
+        changes: dict[int, tuple[bool, SelectorMessage | None]] = pending["roles"]
+
+        live = self._live_member(guild, member.id)
+        if live is not None:
+            member = live
+        current, target, stale, rejected = self._plan_roles(member, changes)
+        self.edit_stats["rejected"] += len(rejected)
+        added = target - current
+        removed = current - target
+        if live is None:
+            requested = set(changes) - set(rejected)
+            added |= requested & target
+            removed = {role_id for role_id in removed | (requested - target) if guild.get_role(role_id) is not None}
+        if not added and not removed:
+            self.edit_stats["cancelled"] += len(changes)
+            self.edit_stats["calls_saved"] += len(changes)
+            await self._clear_reactions(member, stale)
             return
-        
-        for msg in guild_data.get("messages", []):
-            if msg.get("message_id") == message.id:
-                
-                try:
-                    user: nextcord.Member = guild.get_member(payload.user_id) or await guild.fetch_member(payload.user_id)
-                except nextcord.NotFound:
-                    print(f'No user found on server {guild.name}. ID: {payload.user_id}')
-                    return
-                
-                for role_config in msg.get("roles", []):
-                    emoji_match = str(payload.emoji) == role_config.get("emote")
-                    
-                    if emoji_match:
-                        role_id = role_config.get("role")
-                        role: Role = guild.get_role(role_id)
-
-                        if not role:
-                            print(f'No role found on server {guild.name}. Role ID: {role_id}')
-                            continue
-                        
-                        action_name = "added" if is_add else "removed"
-                        try:
-                            if is_add:
-                                if role not in user.roles:
-                                    await user.add_roles(role)
-                                    action_log = f"{role.name} role ADDED."
-                                else:
-                                    action_log = f"The role {role.name} ALREADY EXISTED."
-                            else:
-                                if role in user.roles:
-                                    await user.remove_roles(role)
-                                    action_log = f"The {role.name} role has been REMOVED."
-                                else:
-                                    action_log = f"The {role.name} role did not already exist."
-                            
-                            print(
-                                f"[{guild.name}] {user.name} with {payload.emoji.name}{action_log}"
-                            )
-                        except nextcord.Forbidden:
-                            print(f"[{guild.name}] Authorization error for {action_name} to {user.name} for role {role.name}.")
-                        except Exception as e:
-                            print(f"Error during role {action_name}: {e}")
-                
-                return 
+
+        try:
+            started = time.perf_counter()
+            if live is not None:
+                self._rest('PATCH /guilds/{guild_id}/members/{user_id}')
+                await member.edit(roles=[guild.get_role(role_id) or nextcord.Object(id=role_id) for role_id in target])
+                calls = 1
+            else:
+                if added:
+                    for _ in added:
+                        self._rest('PUT /guilds/{guild_id}/members/{user_id}/roles/{role_id}')
+                    await member.add_roles(*(guild.get_role(role_id) for role_id in added))
+                if removed:
+                    for _ in removed:
+                        self._rest('DELETE /guilds/{guild_id}/members/{user_id}/roles/{role_id}')
+                    await member.remove_roles(*(guild.get_role(role_id) for role_id in removed))
+                calls = len(added) + len(removed)
+            self.metrics.observe('rolechanger_stage_seconds', time.perf_counter() - started, stage='role_edit')
+            self.edit_stats["member_edits"] += 1
+            self.edit_stats["calls_saved"] += max(0, len(changes) - calls)
+            if reaction_log.isEnabledFor(logging.INFO):
+                reaction_log.info(
+                    '[%s] %s roles ADDED: %s | REMOVED: %s', guild.name, member.name,
+                    self._role_names(guild, added) or '-', self._role_names(guild, removed) or '-',
+                    extra={"guild_id": guild.id, "user_id": member.id, "action": "edit_roles", "sampled": True}
+                )
+            await self._clear_reactions(member, stale)
+        except nextcord.Forbidden:
+            reaction_log.error('[%s] Authorization error while updating the roles of %s.', guild.name, member.name, extra={"guild_id": guild.id, "user_id": member.id, "action": "edit_roles"})
+        except nextcord.HTTPException as e:
+            if e.status != 429:
+                reaction_log.error('Error while updating the roles of %s: %s', member.name, e, extra={"guild_id": guild.id, "user_id": member.id, "action": "edit_roles"})
+                return
+            newer = self._pending_edits.get(key)
+            if newer is not None:
+                pending["member"] = newer["member"]
+                for role_id, change in newer["roles"].items():
+                    pending["roles"].pop(role_id, None)
+                    pending["roles"][role_id] = change
+            self._pending_edits[key] = pending
+            raise
+        except Exception:
+            reaction_log.exception('Error while updating the roles of %s.', member.name, extra={"guild_id": guild.id, "user_id": member.id, "action": "edit_roles"})
+
+    def _live_member(self, guild: nextcord.Guild, member_id: int) -> nextcord.Member | None:
+        if not self.bot.intents.members:
+            return None
+        return guild.get_member(member_id)
+
+    def _plan_roles(self, member: nextcord.Member, changes: dict[int, tuple[bool, SelectorMessage | None]]) -> tuple[set[int], set[int], list[tuple[SelectorMessage, str]], list[int]]:
+        guild = member.guild
+        current = {role.id for role in member.roles if not role.is_default()}
+        target = set(current)
+        stale: list[tuple[SelectorMessage, str]] = []
+        rejected: list[int] = []
+        for role_id, (is_add, msg) in changes.items():
+            mode = msg.mode if msg is not None else "normal"
+            if mode == "remove":
+                target.discard(role_id)
+                stale.append((msg, msg.emote_for(role_id)))
+                continue
+            if not is_add:
+                target.discard(role_id)
+                continue
+            if guild.get_role(role_id) is None:
+                reaction_log.warning('No role found on server %s.', guild.name, extra={"guild_id": guild.id, "user_id": member.id, "role_id": role_id, "action": "add"})
+                continue
+            if mode == "unique":
+                for binding in msg.bindings.values():
+                    if binding.role_id != role_id and binding.role_id in target:
+                        target.discard(binding.role_id)
+                        stale.append((msg, binding.emote))
+            elif mode == "limit" and role_id not in target and sum(binding.role_id in target for binding in msg.bindings.values()) >= msg.limit:
+                rejected.append(role_id)
+                stale.append((msg, msg.emote_for(role_id)))
+                continue
+            target.add(role_id)
+        return current, target, stale, rejected
+
+    async def _clear_reactions(self, member: nextcord.Member, stale: list[tuple[SelectorMessage, str]]):
+        async def clear(msg: SelectorMessage, emote: str):
+            channel = self.bot.get_channel(msg.channel_id)
+            if channel is None or emote is None or msg.kind != "reaction":
+                return False
+            self._rest('DELETE /channels/{channel_id}/messages/{message_id}/reactions/{emoji}/{user_id}')
+            await channel.get_partial_message(msg.message_id).remove_reaction(emote, member)
+            return True
+
+        if not stale:
+            return
+        for result in await asyncio.gather(*(clear(msg, emote) for msg, emote in stale), return_exceptions=True):
+            if result is True:
+                self.edit_stats["reactions_removed"] += 1
+            elif isinstance(result, Exception) and not isinstance(result, nextcord.NotFound):
+                reaction_log.warning('Could not remove a reaction of %s: %s', member.name, result, extra={"guild_id": member.guild.id, "user_id": member.id, "action": "clear_reaction"})
+
+    def _role_names(self, guild: nextcord.Guild, role_ids: set[int]) -> str:
+        return ", ".join(role.name if (role := guild.get_role(role_id)) else str(role_id) for role_id in role_ids)
+
+    def _mode_error(self, mode: str, limit: int) -> str | None:
+        if mode not in _selector_modes:
+            return f"Unknown mode **{mode}**. Use one of: {', '.join(_selector_modes)}."
+        if mode == "limit" and limit < 1:
+            return "The limit mode needs a `limit` of at least 1."
+        return None
+
+    def _render_embed(self, guild: nextcord.Guild | None, msg: SelectorMessage) -> Embed:
+        embed = Embed(
+            color=nextcord.Color(msg.color) if msg.color is not None else nextcord.Color.blue(),
+            title=msg.title or None,
+            description=msg.description or None
+        )
+        for binding in msg.bindings.values():
+            role = guild.get_role(binding.role_id) if guild else None
+            embed.add_field(
+                name=f"{binding.emote} {role.name if role else binding.role_id} :",
+                value=binding.description,
+                inline=False
+            )
+        if msg.mode != "normal":
+            embed.set_footer(text=_selector_modes[msg.mode].format(limit=msg.limit))
+        return embed
+
+    def _render_view(self, guild: nextcord.Guild | None, msg: SelectorMessage) -> nextcord.ui.View | None:
+        if msg.kind == "reaction":
+            return None
+
+        view = nextcord.ui.View(timeout=None, prevent_update=False)
+        names = {binding.emote: role.name if guild and (role := guild.get_role(binding.role_id)) else str(binding.role_id) for binding in msg.bindings.values()}
+        if msg.kind == "button":
+            for binding in msg.bindings.values():
+                view.add_item(nextcord.ui.Button(label=names[binding.emote][:80], emoji=binding.emote, custom_id=f'{_component_prefix}{binding.emote}'))
+        elif msg.bindings:
+            max_values = 1 if msg.mode == "unique" else min(msg.limit, len(msg.bindings)) if msg.mode == "limit" else len(msg.bindings)
+            view.add_item(nextcord.ui.StringSelect(
+                custom_id=f'{_component_prefix}select',
+                placeholder="Choose your roles",
+                min_values=0,
+                max_values=max_values,
+                options=[
+                    nextcord.SelectOption(label=names[binding.emote][:100], value=binding.emote, emoji=binding.emote, description=binding.description[:100] or None)
+                    for binding in msg.bindings.values()
+                ]
+            ))
+        return view
+
+    def _adopt_embed(self, guild_config: GuildConfig, msg: SelectorMessage, embed: dict):
+        msg.title = embed.get("title") or ""
+        msg.description = embed.get("description") or ""
+        msg.color = embed.get("color")
+        self.guilds.put(guild_config)
+        self.storage.message_updated(guild_config, msg)
+        self.render_stats["adopted"] += 1
+
+    def _render_later(self, guild_id: int, msg: SelectorMessage):
+        self.render_stats["requested"] += 1
+        if msg.message_id in self._renders:
+            return
+        self._renders[msg.message_id] = asyncio.get_running_loop().create_task(self._render(guild_id, msg.message_id))
+
+    async def _render(self, guild_id: int, message_id: int):
+        await asyncio.sleep(_render_delay)
+        self._renders.pop(message_id, None)
+        self.guilds.pin(guild_id)
+        try:
+            await self._render_pinned(guild_id, message_id)
+        finally:
+            self.guilds.unpin(guild_id)
+
+    async def _render_pinned(self, guild_id: int, message_id: int):
+        guild_config = await self._get_guild(guild_id)
+        msg = guild_config.messages.get(message_id) if guild_config else None
+        channel = self.bot.get_channel(msg.channel_id) if msg else None
+        if channel is None:
+            return
+
+        if not msg.has_embed:
+            message = await self._fetch_selector(msg)
+            if message is None or not message.embeds:
+                command_log.warning('The selector message could not be fetched, it was not re-rendered.', extra={"guild_id": guild_id, "message_id": message_id, "action": "render"})
+                return
+            self._adopt_embed(guild_config, msg, message.embeds[0].to_dict())
+
+        try:
+            self._rest('PATCH /channels/{channel_id}/messages/{message_id}')
+            guild = self.bot.get_guild(guild_id)
+            await channel.get_partial_message(message_id).edit(embed=self._render_embed(guild, msg), view=self._render_view(guild, msg))
+            self.render_stats["renders"] += 1
+        except nextcord.HTTPException as e:
+            self.render_stats["failed"] += 1
+            command_log.error('Could not render the selector message: %s', e, extra={"guild_id": guild_id, "message_id": message_id, "action": "render"})
+
+    async def _send_selector(self, guild_config: GuildConfig, channel: nextcord.abc.Messageable, title: str, description: str, mode: str = "normal", limit: int = 0, kind: str = "reaction") -> tuple[Message, SelectorMessage]:
+        msg = SelectorMessage(None, channel.id, mode=mode, limit=limit if mode == "limit" else 0, title=title, description=description, color=nextcord.Color.blue().value, kind=kind)
+        self._rest('POST /channels/{channel_id}/messages')
+        message: Message = await channel.send(embed=self._render_embed(channel.guild, msg))
+
+        msg.message_id = message.id
+        guild_config.messages[msg.message_id] = msg
+        self._index_message(msg.message_id, guild_config.guild_id)
+        self.guilds.put(guild_config)
+        self.storage.message_added(guild_config, msg)
+        return message, msg
+
+    def _add_bindings(self, guild_config: GuildConfig, msg: SelectorMessage, bindings: list[RoleBinding]):
+        for binding in bindings:
+            msg.bindings[binding.emote] = binding
+        self.guilds.put(guild_config)
+        self.storage.roles_added(guild_config, msg, bindings)
+
+    def _binding_error(self, guild: nextcord.Guild, bindings: dict[str, RoleBinding], role: Role, emote: str, kind: str = "reaction") -> str | None:
+        limit = _reaction_limit if kind == "reaction" else _component_limit
+        if len(bindings) >= limit:
+            return f"A {kind} selector can hold at most {limit} roles."
+        if kind != "reaction":
+            custom = _custom_emoji.match(emote)
+            if custom is None and not _is_unicode_emoji(emote):
+                return f"**{emote}** is not an emoji. Use a unicode emoji or a custom one like `<:name:id>`."
+            if custom is not None and self.bot.intents.emojis_and_stickers and self.bot.get_emoji(int(custom.group(1))) is None:
+                return f"The bot cannot use the emoji **{emote}**. Use an emoji from a server the bot is in."
+        if emote in bindings:
+            return f"The emoji **{emote}** is already assigned to a role in this selector."
+        if any(binding.role_id == role.id for binding in bindings.values()):
+            return f"The role **{role.name}** is already registered in this selector."
+        if guild.me.top_role.position <= role.position:
+            return f"The bot's role is not high enough to assign **{role.name}**. Move the bot's role above this role."
+        return None
+
+    async def _provision_selector(self, guild_config: GuildConfig, guild: nextcord.Guild, message: nextcord.PartialMessage, msg: SelectorMessage, items: list[tuple[str, Role, str]]) -> tuple[list[str], list[str]]:
+        added, failures = [], []
+        valid = []
+        pending = dict(msg.bindings)
+        for emote, role, description in items:
+            error = self._binding_error(guild, pending, role, emote, msg.kind)
+            if error:
+                failures.append(error)
+                continue
+            pending[emote] = RoleBinding(role.id, emote, description)
+            valid.append((emote, role, description))
+
+        if msg.kind == "reaction":
+            results = await self._seed_reactions(message, [emote for emote, _, _ in valid])
+        else:
+            results = [None] * len(valid)
+        seeded = []
+        for (emote, role, description), result in zip(valid, results):
+            if isinstance(result, Exception):
+                failures.append(f"Could not add the reaction **{emote}** for **{role.name}**: {result}")
+            else:
+                seeded.append((emote, role, description))
+
+        if not seeded:
+            return added, failures
+
+        self._add_bindings(guild_config, msg, [RoleBinding(role.id, emote, description) for emote, role, description in seeded])
+        self._render_later(guild_config.guild_id, msg)
+
+        added.extend(f"{emote} {role.name}" for emote, role, _ in seeded)
+        command_log.info('[%s] %s roles were added to the message.', guild.name, len(seeded), extra={"guild_id": guild.id, "message_id": message.id, "action": "provision"})
+        return added, failures
+
+    async def _seed_reactions(self, message: nextcord.PartialMessage, emotes: list[str]) -> list:
+        semaphore = asyncio.Semaphore(_reaction_seed_concurrency)
+
+        async def seed(emote: str):
+            async with semaphore:
+                self._rest('PUT /channels/{channel_id}/messages/{message_id}/reactions/{emoji}/@me')
+                await message.add_reaction(emoji=emote)
+
+        return await asyncio.gather(*(seed(emote) for emote in emotes), return_exceptions=True)
+
+    def _resolve_role(self, guild: nextcord.Guild, role_id, role_name: str | None) -> Role | None:
+        role = None
+        try:
+            role = guild.get_role(int(role_id)) if role_id is not None else None
+        except (TypeError, ValueError):
+            role_name = role_name or str(role_id)
+        if role is None and role_name:
+            role = nextcord.utils.get(guild.roles, name=role_name)
+        return role
+
+    def _partial_selector(self, msg: SelectorMessage) -> nextcord.PartialMessage | None:
+        channel = self.bot.get_channel(msg.channel_id)
+        return channel.get_partial_message(msg.message_id) if channel else None
+
+    async def _fetch_selector(self, msg: SelectorMessage) -> Message | None:
+        channel = self.bot.get_channel(msg.channel_id)
+        if not channel:
+            return None
+        try:
+            self._rest('GET /channels/{channel_id}/messages/{message_id}')
+            return await channel.fetch_message(msg.message_id)
+        except nextcord.HTTPException:
+            return None
+
+    def _selector_spec_error(self, selector) -> str | None:
+        if not isinstance(selector, dict):
+            return "Each selector must be an object."
+        for key in ("title", "description", "mode", "kind"):
+            if selector.get(key) is not None and not isinstance(selector[key], str):
+                return f"`{key}` must be a string."
+        for key in ("message_id", "limit"):
+            value = selector.get(key)
+            if value is not None and (isinstance(value, bool) or not isinstance(value, int)):
+                return f"`{key}` must be a whole number."
+        if not isinstance(selector.get("roles", []), list):
+            return "`roles` must be a list."
+        return None
+
+    def _role_spec_error(self, role_spec) -> str | None:
+        if not isinstance(role_spec, dict):
+            return "Each role entry must be an object."
+        if not isinstance(role_spec.get("emote"), str) or not role_spec["emote"].strip():
+            return "Each role entry needs an `emote`."
+        role = role_spec.get("role")
+        if role is not None and (isinstance(role, bool) or not isinstance(role, (int, str))):
+            return "`role` must be a role ID."
+        for key in ("role_name", "description"):
+            if role_spec.get(key) is not None and not isinstance(role_spec[key], str):
+                return f"`{key}` must be a string."
+        return None
+
+    async def _send_report(self, interaction: Interaction, summary: str, failures: list[str]):
+        content = summary
+        if failures:
+            content += "\n" + "\n".join(f"⚠️ {failure}" for failure in failures)
+        if len(content) > 1900:
+            content = content[:1900] + "\n…"
+        await interaction.followup.send(content, ephemeral=True)
 
     @rolechanger.subcommand(name="create_message", description="It allows the bot to send a reaction message where it can add or remove roles with a reaction.")
-    async def create_message(self, interaction: Interaction, title: str = "Find the one that suits you.", description: str = "Click on the relevant emoji to add/remove the role you want on the server."):
+    async def create_message(
+        self, interaction: Interaction,
+        title: str = "Find the one that suits you.",
+        description: str = "Click on the relevant emoji to add/remove the role you want on the server.",
+        mode: str = SlashOption(description="How the selector hands out roles.", choices=list(_selector_modes), required=False, default="normal"),
+        limit: int = SlashOption(description="Maximum number of roles per member for the limit mode.", required=False, default=0, min_value=0),
+        kind: str = SlashOption(description="Whether members pick roles with reactions, buttons or a menu.", choices=list(_selector_kinds), required=False, default="reaction")
+    ):
         await interaction.response.defer(ephemeral=True) 
 
-        guild_data = self._get_guild_data(interaction.guild.id, create_if_missing=True)
-        if not guild_data:
+        error = self._mode_error(mode, limit)
+        if error:
+            await interaction.followup.send(f"ERROR: {error}", ephemeral=True)
+            return
+
+        guild_config = await self._get_guild(interaction.guild.id, create_if_missing=True)
+        if not guild_config:
             await interaction.followup.send("Failed to create server data.", ephemeral=True)
             return
 
-        embed = Embed(
-            color=nextcord.Color.blue(),
-            title=title,
-            description=description
-        )
         try:
-            message: Message = await interaction.channel.send(embed=embed)
+            message, _ = await self._send_selector(guild_config, interaction.channel, title, description, mode, limit, kind)
         except nextcord.Forbidden:
-            print(f'[{interaction.guild.name}] is not allowed to send messages.')
+            command_log.error('[%s] is not allowed to send messages.', interaction.guild.name, extra={"guild_id": interaction.guild.id, "channel_id": interaction.channel.id, "action": "create_message"})
             await interaction.followup.send("ERROR: I do not have permission to send messages to this channel. Please check your permissions.", ephemeral=True)
             return
 
-        guild_data["messages"].append({
-            "message_id": message.id, 
-            "channel_id": interaction.channel.id,
-            "roles": []
-        })
-        self._save_config()
-
-        print(f"[{interaction.guild.name}] An empty message was created for role selection. ID: {message.id}, Channel ID: {interaction.channel.id}")
+        command_log.info('[%s] An empty message was created for role selection.', interaction.guild.name, extra={"guild_id": interaction.guild.id, "channel_id": interaction.channel.id, "message_id": message.id, "action": "create_message"})
         await interaction.followup.send(f"✅ A role selection message has been created. Message ID: `{message.id}`. You can now add roles with the `/rolechanger add_role` command.", ephemeral=False)
 
+    @rolechanger.subcommand(name="set_mode", description="Changes how a selector hands out its roles.")
+    async def set_mode(
+        self, interaction: Interaction, message_id: str,
+        mode: str = SlashOption(description="How the selector hands out roles.", choices=list(_selector_modes)),
+        limit: int = SlashOption(description="Maximum number of roles per member for the limit mode.", required=False, default=0, min_value=0)
+    ):
+        await interaction.response.defer(ephemeral=True)
+
+        error = self._mode_error(mode, limit)
+        if error:
+            await interaction.followup.send(f"ERROR: {error}", ephemeral=True)
+            return
+
+        try:
+            message_id_int = int(message_id)
+        except ValueError:
+            await interaction.followup.send("ERROR: Invalid Message ID format. Please enter a numeric ID.", ephemeral=True)
+            return
+
+        guild_config = await self._get_guild(interaction.guild.id)
+        msg = guild_config.messages.get(message_id_int) if guild_config else None
+        if msg is None:
+            await interaction.followup.send("WARNING: No registered role selector with this message ID was found.", ephemeral=True)
+            return
+
+        msg.mode = mode
+        msg.limit = limit if mode == "limit" else 0
+        self.guilds.put(guild_config)
+        self.storage.message_updated(guild_config, msg)
+
+        self._render_later(guild_config.guild_id, msg)
+
+        command_log.info('[%s] The selector mode was changed to %s.', interaction.guild.name, mode, extra={"guild_id": interaction.guild.id, "message_id": message_id_int, "action": "set_mode"})
+        await interaction.followup.send(f"✅ The selector (ID: `{message_id_int}`) now uses the **{mode}** mode.", ephemeral=True)
+
+    @rolechanger.subcommand(name="convert_selector", description="Switches an existing selector between reactions, buttons and a menu without recreating it.")
+    async def convert_selector(
+        self, interaction: Interaction, message_id: str,
+        kind: str = SlashOption(description="Whether members pick roles with reactions, buttons or a menu.", choices=list(_selector_kinds))
+    ):
+        await interaction.response.defer(ephemeral=True)
+
+        try:
+            message_id_int = int(message_id)
+        except ValueError:
+            await interaction.followup.send("ERROR: Invalid Message ID format. Please enter a numeric ID.", ephemeral=True)
+            return
+
+        guild_config = await self._get_guild(interaction.guild.id)
+        msg = guild_config.messages.get(message_id_int) if guild_config else None
+        if msg is None:
+            await interaction.followup.send("WARNING: No registered role selector with this message ID was found.", ephemeral=True)
+            return
+        if msg.kind == kind:
+            await interaction.followup.send(f"WARNING: The selector already uses **{kind}**.", ephemeral=True)
+            return
+        limit = _reaction_limit if kind == "reaction" else _component_limit
+        if len(msg.bindings) > limit:
+            await interaction.followup.send(f"ERROR: A {kind} selector can hold at most {limit} roles, this one has {len(msg.bindings)}.", ephemeral=True)
+            return
+        invalid = [emote for emote in msg.bindings if kind != "reaction" and _custom_emoji.match(emote) is None and not _is_unicode_emoji(emote)]
+        if invalid:
+            await interaction.followup.send(f"ERROR: These bindings cannot be shown on a {kind}: {', '.join(invalid)}.", ephemeral=True)
+            return
+
+        message = self._partial_selector(msg)
+        if message is None:
+            await interaction.followup.send("ERROR: The channel containing the message was not found or cannot be accessed.", ephemeral=True)
+            return
+
+        failures = []
+        if msg.kind == "reaction":
+            try:
+                self._rest('DELETE /channels/{channel_id}/messages/{message_id}/reactions')
+                await message.clear_reactions()
+            except nextcord.NotFound:
+                await interaction.followup.send("ERROR: The message with the specified ID was not found in that channel. Please check the ID.", ephemeral=True)
+                return
+            except nextcord.Forbidden:
+                failures.append("I don't have permission to remove the old reactions. Please remove them manually.")
+
+        msg.kind = kind
+        self.guilds.put(guild_config)
+        self.storage.message_updated(guild_config, msg)
+        self._render_later(guild_config.guild_id, msg)
+
+        if kind == "reaction":
+            emotes = list(msg.bindings)
+            for emote, result in zip(emotes, await self._seed_reactions(message, emotes)):
+                if isinstance(result, Exception):
+                    failures.append(f"Could not add the reaction **{emote}**: {result}")
+
+        command_log.info('[%s] The selector was converted to %s.', interaction.guild.name, kind, extra={"guild_id": interaction.guild.id, "message_id": message_id_int, "action": "convert_selector"})
+        await self._send_report(interaction, f"✅ The selector (ID: `{message_id_int}`) now uses **{kind}**. Members keep the roles they already have.", failures)
+
     @rolechanger.subcommand('remove_message', 'Deletes a previously sent election message and removes it from the configuration.')
     async def remove_message(self, interaction: Interaction, message_id: str):
         await interaction.response.defer(ephemeral=True)
@@ -169,39 +960,39 @@ class ReactionRoles(commands.Cog):
             await interaction.followup.send("ERROR: Invalid Message ID format. Please enter a numeric ID.", ephemeral=True)
             return
 
-        guild_data = self._get_guild_data(interaction.guild.id)
-        if not guild_data:
+        guild_config = await self._get_guild(interaction.guild.id)
+        if not guild_config:
             await interaction.followup.send("WARNING: There is no role selector data stored on this server.", ephemeral=True)
             return
         
-        msg_data_to_remove = next((msg for msg in guild_data.get("messages", []) if msg.get("message_id") == message_id_int), None)
+        msg_to_remove = guild_config.messages.get(message_id_int)
         
-        if msg_data_to_remove:
-            channel_id = msg_data_to_remove.get("channel_id")
+        if msg_to_remove:
+            channel_id = msg_to_remove.channel_id
             channel = self.bot.get_channel(channel_id)
             
             if channel:
                 try:
+                    self._rest('GET /channels/{channel_id}/messages/{message_id}')
                     message = await channel.fetch_message(message_id_int)
+                    self._rest('DELETE /channels/{channel_id}/messages/{message_id}')
                     await message.delete()
-                    print(f"The message with ID [{interaction.guild.name}] ({message_id_int}) was deleted from channel {channel.name}.")
+                    command_log.info('[%s] The message was deleted from channel %s.', interaction.guild.name, channel.name, extra={"guild_id": interaction.guild.id, "channel_id": channel_id, "message_id": message_id_int, "action": "remove_message"})
                 except nextcord.NotFound:
-                    print(f"[{interaction.guild.name}] Message ({message_id_int}) did not already exist on Discord.")
+                    command_log.info('[%s] The message did not already exist on Discord.', interaction.guild.name, extra={"guild_id": interaction.guild.id, "channel_id": channel_id, "message_id": message_id_int, "action": "remove_message"})
                 except Exception as e:
                     await interaction.followup.send(f"ERROR: There was a problem deleting the message: {e}", ephemeral=True)
-                    print(f"[{interaction.guild.name}] Error deleting message ({message_id_int}): {e}")
+                    command_log.error('[%s] Error deleting message: %s', interaction.guild.name, e, extra={"guild_id": interaction.guild.id, "channel_id": channel_id, "message_id": message_id_int, "action": "remove_message"})
                     return
             else:
-                 print(f"[{interaction.guild.name}] The channel ({channel_id}) used to delete the message could not be found. Removing it from the configuration.")
+                command_log.warning('[%s] The channel used to delete the message could not be found. Removing it from the configuration.', interaction.guild.name, extra={"guild_id": interaction.guild.id, "channel_id": channel_id, "message_id": message_id_int, "action": "remove_message"})
 
 
-        initial_count = len(guild_data["messages"])
-        guild_data["messages"] = [
-            msg for msg in guild_data["messages"] if msg.get("message_id") != message_id_int
-        ]
-
-        if len(guild_data["messages"]) < initial_count:
-            self._save_config()
+        if msg_to_remove is not None:
+            guild_config.messages.pop(message_id_int, None)
+            self._unindex_message(message_id_int)
+            self.guilds.put(guild_config)
+            self.storage.message_removed(guild_config, message_id_int)
             await interaction.followup.send(f"✅ Role selection message (ID: `{message_id_int}`) has been successfully deleted and removed from the configuration.", ephemeral=False)
         else:
             await interaction.followup.send(f"⚠️ Warning: The message was deleted from Discord or was not found, but no entry with this ID (`{message_id_int}`) was found in the configuration.", ephemeral=False)
@@ -210,12 +1001,12 @@ class ReactionRoles(commands.Cog):
     async def list_messages(self, interaction: Interaction):
         await interaction.response.defer(ephemeral=True)
         
-        guild_data = self._get_guild_data(interaction.guild.id)
-        if not guild_data:
+        guild_config = await self._get_guild(interaction.guild.id)
+        if not guild_config:
             await interaction.followup.send("There are **no** servers registered.", ephemeral=True)
             return
             
-        messages = guild_data.get("messages", [])
+        messages = list(guild_config.messages.values())
 
         if not messages:
             await interaction.followup.send("There are **no** role selection messages recorded on the server.", ephemeral=True)
@@ -223,17 +1014,19 @@ class ReactionRoles(commands.Cog):
 
         list_content = []
         for i, msg in enumerate(messages, 1):
-            message_id = msg.get("message_id")
-            channel_id = msg.get("channel_id")
-            role_count = len(msg.get("roles", []))
+            message_id = msg.message_id
+            channel_id = msg.channel_id
+            role_count = len(msg.bindings)
+            mode = f"{msg.mode} ({msg.limit})" if msg.mode == "limit" else msg.mode
+            kind = msg.kind
             
             message_link = f"https://discord.com/channels/{interaction.guild.id}/{channel_id}/{message_id}"
             
-            channel = interaction.guild.get_channel(channel_id)
+            channel = interaction.guild.get_channel_or_thread(channel_id)
                             
             list_content.append(
                 f"**{i}.** [See Message]({message_link})\n"
-                f"** ↳ channel:** {channel.name} | **Role count:** {role_count}"
+                f"** ↳ channel:** {channel.name if channel else 'deleted'} | **Role count:** {role_count} | **Mode:** {mode} | **Kind:** {kind}"
             )
 
         embed = Embed(
@@ -249,8 +1042,8 @@ class ReactionRoles(commands.Cog):
     async def add_role(self, interaction: Interaction, message_id: str, role: Role, emote: str, description: str):
         await interaction.response.defer(ephemeral=True)
         
-        guild_data = self._get_guild_data(interaction.guild.id)
-        if not guild_data:
+        guild_config = await self._get_guild(interaction.guild.id)
+        if not guild_config:
             await interaction.followup.send("WARNING: There is no role selector data stored on this server. Create a message first.", ephemeral=True)
             return
 
@@ -261,76 +1054,51 @@ class ReactionRoles(commands.Cog):
              await interaction.followup.send("ERROR: Invalid Message ID format. Please enter a numeric ID.", ephemeral=True)
              return
 
-        msg_data = next((msg for msg in guild_data["messages"] if msg.get("message_id") == message_id_int), None)
+        msg = guild_config.messages.get(message_id_int)
         
-        if msg_data is None:
+        if msg is None:
             await interaction.followup.send("WARNING: No registered role selector with this message ID was found.", ephemeral=True)
             return
         
-        channel_id = msg_data.get("channel_id", interaction.channel.id) 
+        channel_id = msg.channel_id or interaction.channel.id 
         channel = self.bot.get_channel(channel_id)
 
         if not channel:
             await interaction.followup.send("ERROR: The channel containing the message was not found or cannot be accessed.", ephemeral=True)
             return
 
-        try:
-            message: Message = await channel.fetch_message(message_id_int)
-        except nextcord.NotFound:
-            await interaction.followup.send("ERROR: The message with the specified ID was not found in that channel. Please check the ID.", ephemeral=True)
-            return
-        except nextcord.Forbidden:
-            await interaction.followup.send("ERROR: I do not have permission to fetch the message. Please check the permissions.", ephemeral=True)
+        error = self._binding_error(interaction.guild, msg.bindings, role, emote, msg.kind)
+        if error:
+            await interaction.followup.send(f"ERROR: {error}", ephemeral=True)
             return
 
+        try:
+            if msg.kind == "reaction":
+                message = channel.get_partial_message(message_id_int)
+                self._rest('PUT /channels/{channel_id}/messages/{message_id}/reactions/{emoji}/@me')
+                await message.add_reaction(emoji=emote)
 
-        for r_config in msg_data["roles"]:
-            if r_config.get("emote") == emote:
-                await interaction.followup.send(f"ERROR: The emoji **{emote}** is already assigned to a role in this selector.", ephemeral=True)
-                return
-            if r_config.get("role") == role.id:
-                await interaction.followup.send(f"ERROR: The role **{role.name}** is already registered in this selector.", ephemeral=True)
-                return
-        
-        if interaction.guild.me.top_role.position <= role.position:
-            await interaction.followup.send("ERROR: The bot's role is not high enough to assign this role. Move the bot's role above this role.", ephemeral=True)
-            return
+            self._add_bindings(guild_config, msg, [RoleBinding(role.id, emote, description)])
+            self._render_later(guild_config.guild_id, msg)
 
-        try:
-            embed = message.embeds[0].copy()
-            embed.add_field(
-                name=f"{emote} {role.name} :",
-                value=description,
-                inline=False
-            )
-            
-            await message.edit(embed=embed)
-            await message.add_reaction(emoji=emote)
-
-            new_role_config = {
-                "role": role.id,
-                "emote": emote,
-                "description": description
-            }
-            msg_data["roles"].append(new_role_config)
-            self._save_config()
-
-            print(f"The role ({emote} {role.name}) has been added to the message with ID [{interaction.guild.name}] ({message_id}).")
+            command_log.info('[%s] The role (%s %s) has been added to the message.', interaction.guild.name, emote, role.name, extra={"guild_id": interaction.guild.id, "message_id": message_id_int, "role_id": role.id, "action": "add_role"})
             await interaction.followup.send(f"✅ Successfully added **{emote}** emoji and (**{role.name}**) role to the role selection message.", ephemeral=False)
 
+        except nextcord.NotFound:
+            await interaction.followup.send("ERROR: The message with the specified ID was not found in that channel. Please check the ID.", ephemeral=True)
         except nextcord.Forbidden:
-            print(f'[{interaction.guild.name}] Does not have permission to edit message/add emoji.')
+            command_log.error('[%s] Does not have permission to edit message/add emoji.', interaction.guild.name, extra={"guild_id": interaction.guild.id, "message_id": message_id_int, "action": "add_role"})
             await interaction.followup.send("ERROR: I don't have permission to edit the message or add emojis. Please check permissions.", ephemeral=True)
         except Exception as e:
-            print(f"A general error occurred while adding a role to a message: {e}")
+            command_log.exception('A general error occurred while adding a role to a message.', extra={"guild_id": interaction.guild.id, "message_id": message_id_int, "action": "add_role"})
             await interaction.followup.send(f"ERROR: An unexpected problem occurred: {e}", ephemeral=True)
 
     @rolechanger.subcommand(name="remove_role", description="Removes a role from the specified selector.")
     async def remove_role(self, interaction: Interaction, message_id: str, emote: str):
         await interaction.response.defer(ephemeral=True)
 
-        guild_data = self._get_guild_data(interaction.guild.id)
-        if not guild_data:
+        guild_config = await self._get_guild(interaction.guild.id)
+        if not guild_config:
             await interaction.followup.send("WARNING: There is no role selector data stored on this server.", ephemeral=True)
             return
 
@@ -341,78 +1109,324 @@ class ReactionRoles(commands.Cog):
             await interaction.followup.send("ERROR: Invalid Message ID format. Please enter a numeric ID.", ephemeral=True)
             return
 
-        msg_data = next((msg for msg in guild_data["messages"] if msg.get("message_id") == message_id_int), None)
+        msg = guild_config.messages.get(message_id_int)
 
-        if msg_data is None:
+        if msg is None:
             await interaction.followup.send("WARNING: No registered role selector with this message ID was found.", ephemeral=True)
             return
         
-        channel_id = msg_data.get("channel_id", interaction.channel.id)
+        channel_id = msg.channel_id or interaction.channel.id
         channel = self.bot.get_channel(channel_id)
 
         if not channel:
             await interaction.followup.send("ERROR: The channel containing the message was not found or cannot be accessed.", ephemeral=True)
             return
 
-        try:
-            message: Message = await channel.fetch_message(message_id_int)
-        except nextcord.NotFound:
-            await interaction.followup.send("ERROR: The message with the specified ID was not found in that channel.", ephemeral=True)
-            return
-        except nextcord.Forbidden:
-            await interaction.followup.send("ERROR: I do not have permission to fetch the message.", ephemeral=True)
-            return
-        
-        
-        role_config_index_to_remove = -1
-        removed_role_name = ""
-        
-        for k, role_config in enumerate(msg_data["roles"]):
-            if role_config.get("emote") == emote:
-                role_config_index_to_remove = k
-                removed_role = interaction.guild.get_role(role_config.get("role"))
-                removed_role_name = removed_role.name if removed_role else "Unknown Role"
-                break
+        removed_binding = msg.bindings.pop(emote, None)
         
-        if role_config_index_to_remove != -1:
-            
-            msg_data["roles"].pop(role_config_index_to_remove)
-            self._save_config()
-            
-            if message.embeds:
-                embed = message.embeds[0].copy()
-                field_index_to_remove = -1
-                for j, field in enumerate(embed.fields):
-                    if field.name.startswith(emote):
-                        field_index_to_remove = j
-                        break
-                
-                if field_index_to_remove != -1:
-                    try:
-                        embed.remove_field(field_index_to_remove)
-                        await message.edit(embed=embed)
-                    except nextcord.Forbidden:
-                        print(f'[{interaction.guild.name}] No permission to edit the message.')
-                        await interaction.followup.send("ERROR: I don't have permission to edit the message. The role was removed from the configuration, but the message could not be updated.", ephemeral=True)
-                    except Exception as e:
-                        print(f"Error while editing message: {e}")
-                        await interaction.followup.send("WARNING: The role was removed from the configuration, but an error occurred while updating the message.", ephemeral=True)
+        if removed_binding is not None:
+            removed_role = interaction.guild.get_role(removed_binding.role_id)
+            removed_role_name = removed_role.name if removed_role else "Unknown Role"
+            self.guilds.put(guild_config)
+            self.storage.role_removed(guild_config, msg, emote)
+            self._render_later(guild_config.guild_id, msg)
 
-            try:
-                await message.clear_reaction(emoji=emote)
-            except nextcord.NotFound:
-                pass
-            except nextcord.Forbidden:
-                print(f"[{interaction.guild.name}] No permission to delete reaction.")
-            except Exception as e:
-                print(f"Error removing response: {e}")
+            if msg.kind == "reaction":
+                try:
+                    self._rest('DELETE /channels/{channel_id}/messages/{message_id}/reactions/{emoji}')
+                    await channel.get_partial_message(message_id_int).clear_reaction(emoji=emote)
+                except nextcord.NotFound:
+                    pass
+                except nextcord.Forbidden:
+                    command_log.error('[%s] No permission to delete reaction.', interaction.guild.name, extra={"guild_id": interaction.guild.id, "message_id": message_id_int, "action": "remove_role"})
+                except Exception:
+                    command_log.exception('Error removing reaction.', extra={"guild_id": interaction.guild.id, "message_id": message_id_int, "action": "remove_role"})
 
-            print(f"The role {emote} ({removed_role_name}) was removed from the message with ID [{interaction.guild.name}] ({message_id}).")
+            command_log.info('[%s] The role %s (%s) was removed from the message.', interaction.guild.name, emote, removed_role_name, extra={"guild_id": interaction.guild.id, "message_id": message_id_int, "action": "remove_role"})
             await interaction.followup.send(f"✅ Successfully removed the role **{emote}** ({removed_role_name}) from the role selector message.", ephemeral=False)
 
         else:
             await interaction.followup.send(f"ERROR: No role matching emoji **{emote}** found in configuration.", ephemeral=True)
 
+    @rolechanger.subcommand(name="add_roles", description="Adds several roles at once. Format: emoji @role description; emoji @role description")
+    async def add_roles(self, interaction: Interaction, message_id: str, roles: str):
+        await interaction.response.defer(ephemeral=True)
+
+        guild_config = await self._get_guild(interaction.guild.id)
+        if not guild_config:
+            await interaction.followup.send("WARNING: There is no role selector data stored on this server. Create a message first.", ephemeral=True)
+            return
+
+        try:
+            message_id_int = int(message_id)
+        except ValueError:
+            await interaction.followup.send("ERROR: Invalid Message ID format. Please enter a numeric ID.", ephemeral=True)
+            return
+
+        msg = guild_config.messages.get(message_id_int)
+        if msg is None:
+            await interaction.followup.send("WARNING: No registered role selector with this message ID was found.", ephemeral=True)
+            return
+
+        items, failures = [], []
+        for entry in filter(str.strip, re.split(r'[;\n]', roles)):
+            match = _role_spec.match(entry)
+            if not match:
+                failures.append(f"Could not read `{entry.strip()}`. Use `emoji @role description`.")
+                continue
+            emote, role_id, description = match.groups()
+            role = interaction.guild.get_role(int(role_id))
+            if role is None:
+                failures.append(f"The role in `{entry.strip()}` was not found.")
+                continue
+            items.append((emote, role, description or role.name))
+
+        message = self._partial_selector(msg)
+        if message is None:
+            await interaction.followup.send("ERROR: The channel containing the message was not found or cannot be accessed.", ephemeral=True)
+            return
+
+        added, provision_failures = await self._provision_selector(guild_config, interaction.guild, message, msg, items)
+        await self._send_report(interaction, f"✅ Added **{len(added)}** role(s) to the role selection message.", failures + provision_failures)
+
+    @rolechanger.subcommand(name="import_selectors", description="Creates or extends role selectors from a JSON/YAML file exported by export_selectors.")
+    async def import_selectors(self, interaction: Interaction, file: nextcord.Attachment):
+        await interaction.response.defer(ephemeral=True)
+
+        if file.size > _import_max_bytes:
+            await interaction.followup.send("ERROR: The file is too large.", ephemeral=True)
+            return
+
+        raw = await file.read()
+        try:
+            if file.filename.lower().endswith(('.yaml', '.yml')):
+                if yaml is None:
+                    await interaction.followup.send("ERROR: YAML files need the PyYAML package to be installed. Please upload JSON instead.", ephemeral=True)
+                    return
+                spec = yaml.safe_load(raw)
+            else:
+                spec = json.loads(raw)
+        except Exception as e:
+            await interaction.followup.send(f"ERROR: The file could not be read: {e}", ephemeral=True)
+            return
+
+        if not isinstance(spec, dict) or not isinstance(spec.get("selectors"), list):
+            await interaction.followup.send("ERROR: The file must contain a `selectors` list.", ephemeral=True)
+            return
+
+        guild = interaction.guild
+        guild_config = await self._get_guild(guild.id, create_if_missing=True)
+        failures = []
+        added_count = 0
+        created_count = 0
+        updated_count = 0
+
+        for index, selector in enumerate(spec["selectors"], 1):
+            error = self._selector_spec_error(selector)
+            if error:
+                failures.append(f"[#{index}] {error}")
+                continue
+
+            label = selector.get("title") or f"#{index}"
+            items = []
+            for role_index, role_spec in enumerate(selector.get("roles", []), 1):
+                error = self._role_spec_error(role_spec)
+                if error:
+                    failures.append(f"[{label}] Role #{role_index}: {error}")
+                    continue
+                role = self._resolve_role(guild, role_spec.get("role"), role_spec.get("role_name"))
+                emote = role_spec["emote"].strip()
+                if role is None:
+                    failures.append(f"[{label}] The role `{role_spec.get('role_name') or role_spec.get('role')}` was not found.")
+                    continue
+                items.append((emote, role, role_spec.get("description") or role.name))
+
+            msg = guild_config.messages.get(selector.get("message_id"))
+            mode = selector.get("mode") or (msg.mode if msg else "normal")
+            limit = selector.get("limit") if selector.get("limit") is not None else (msg.limit if msg else 0)
+            kind = selector.get("kind") or (msg.kind if msg else "reaction")
+            error = self._mode_error(mode, limit) or (None if kind in _selector_kinds else f"Unknown kind **{kind}**. Use one of: {', '.join(_selector_kinds)}.")
+            if error:
+                failures.append(f"[{label}] {error}")
+                continue
+
+            if msg is not None:
+                message = self._partial_selector(msg)
+                if message is None:
+                    failures.append(f"[{label}] The channel of the existing selector was not found.")
+                    continue
+                if kind != msg.kind:
+                    failures.append(f"[{label}] The selector uses **{msg.kind}**, so the kind **{kind}** from the file was skipped. Use `/rolechanger convert_selector` to change it.")
+                limit = limit if mode == "limit" else 0
+                if (mode, limit) != (msg.mode, msg.limit):
+                    msg.mode, msg.limit = mode, limit
+                    self.guilds.put(guild_config)
+                    self.storage.message_updated(guild_config, msg)
+                    self._render_later(guild_config.guild_id, msg)
+                    updated_count += 1
+            else:
+                try:
+                    message, msg = await self._send_selector(
+                        guild_config, interaction.channel,
+                        selector.get("title") or "Find the one that suits you.",
+                        selector.get("description") or "Click on the relevant emoji to add/remove the role you want on the server.",
+                        mode, limit, kind
+                    )
+                    created_count += 1
+                except nextcord.HTTPException as e:
+                    failures.append(f"[{label}] The selector message could not be sent: {e}")
+                    continue
+
+            added, provision_failures = await self._provision_selector(guild_config, guild, message, msg, items)
+            added_count += len(added)
+            failures.extend(f"[{label}] {failure}" for failure in provision_failures)
+
+        await self._send_report(interaction, f"✅ Imported **{len(spec['selectors'])}** selector(s): **{created_count}** created, **{updated_count}** mode(s) updated, **{added_count}** role(s) added.", failures)
+
+    @rolechanger.subcommand(name="export_selectors", description="Exports the role selectors of this server as a JSON file that import_selectors accepts.")
+    async def export_selectors(self, interaction: Interaction, message_id: str = None):
+        await interaction.response.defer(ephemeral=True)
+
+        guild_config = await self._get_guild(interaction.guild.id)
+        messages = list(guild_config.messages.values()) if guild_config else []
+        if message_id is not None:
+            messages = [msg for msg in messages if str(msg.message_id) == message_id.strip()]
+
+        if not messages:
+            await interaction.followup.send("WARNING: No registered role selector was found to export.", ephemeral=True)
+            return
+
+        selectors = []
+        for msg in messages:
+            title, description = msg.title, msg.description
+            if not msg.has_embed:
+                message = await self._fetch_selector(msg)
+                embed = message.embeds[0] if message and message.embeds else None
+                title, description = (embed.title, embed.description) if embed else (None, None)
+            selectors.append({
+                "message_id": msg.message_id,
+                "channel_id": msg.channel_id,
+                "title": title,
+                "description": description,
+                "mode": msg.mode,
+                "limit": msg.limit,
+                "kind": msg.kind,
+                "roles": [
+                    {
+                        "emote": binding.emote,
+                        "role": binding.role_id,
+                        "role_name": role.name if (role := interaction.guild.get_role(binding.role_id)) else None,
+                        "description": binding.description,
+                    }
+                    for binding in msg.bindings.values()
+                ],
+            })
+
+        content = json.dumps({"guild_id": interaction.guild.id, "selectors": selectors}, indent=4, ensure_ascii=False)
+        await interaction.followup.send(
+            f"✅ Exported **{len(selectors)}** selector(s). Import the file on another server to clone them; roles are matched by ID, then by name.",
+            file=nextcord.File(io.BytesIO(content.encode('utf-8')), filename=f"rolechanger_{interaction.guild.id}.json"),
+            ephemeral=True
+        )
+
+    @rolechanger.subcommand(name="stats", description="Shows performance statistics of the role selector.")
+    async def stats(self, interaction: Interaction):
+        metrics = self.metrics
+        events = " | ".join(f"{result}: **{int(metrics.counter('rolechanger_events_total', result=result))}**" for result in ("seen", "ignored", "matched"))
+
+        stages = []
+        for stage in ("guild_lookup", "guild_load", "member_resolve", "role_edit"):
+            histogram = metrics.histogram('rolechanger_stage_seconds', stage=stage)
+            if histogram and histogram.count:
+                stages.append(f"{stage}: p50 ≤ {histogram.quantile(0.5) * 1000:g} ms, p95 ≤ {histogram.quantile(0.95) * 1000:g} ms ({histogram.count})")
+
+        routes = sorted(
+            ((dict(labels).get("route"), value) for (name, labels), value in metrics.counters.items() if name == 'rolechanger_rest_calls_total'),
+            key=lambda item: item[1], reverse=True
+        )
+
+        queue = self.queue.snapshot()
+        writes = [histogram for (name, _), histogram in metrics.histograms.items() if name == 'rolechanger_storage_write_seconds']
+        write_count = sum(histogram.count for histogram in writes)
+        write_time = sum(histogram.sum for histogram in writes)
+        write_bytes = sum(value for (name, _), value in metrics.counters.items() if name == 'rolechanger_storage_write_bytes_total')
+
+        embed = Embed(color=nextcord.Color.blue(), title="📊 Role selector statistics")
+        embed.add_field(name="Reaction events", value=events, inline=False)
+        embed.add_field(name="Stage latency", value="\n".join(stages) or "No data yet.", inline=False)
+        embed.add_field(name="REST calls", value="\n".join(f"`{route}`: **{int(value)}**" for route, value in routes[:8]) or "No calls yet.", inline=False)
+        embed.add_field(
+            name="Role change queue",
+            value=f"Depth: **{queue['depth']}** (max {queue['max_depth']}) | Avg wait: **{queue['wait_avg'] * 1000:.1f} ms** | Rejected: **{queue['rejected']}** | Rate limited: **{queue['rate_limited']}**",
+            inline=False
+        )
+        embed.add_field(
+            name="Coalescing",
+            value=f"Role changes: **{self.edit_stats['role_changes']}** | Member edits: **{self.edit_stats['member_edits']}** | Calls saved: **{self.edit_stats['calls_saved']}**",
+            inline=False
+        )
+        members = self.members.snapshot()
+        embed.add_field(
+            name="Member resolution",
+            value=f"From events: **{members['payload']}** | Gateway cache: **{members['gateway']}** | Cache hits: **{members['hits']}** | Fetched: **{members['fetched']}** | Left: **{members['negative_hits']}**",
+            inline=False
+        )
+        embed.add_field(
+            name="Persistence",
+            value=f"Writes: **{write_count}** | Avg: **{(write_time / write_count * 1000) if write_count else 0:.1f} ms** | Bytes: **{int(write_bytes)}**",
+            inline=False
+        )
+
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @rolechanger.subcommand(name="memory", description="Shows how much memory the loaded role selector data uses.")
+    async def memory(self, interaction: Interaction):
+        guild_config = await self._get_guild(interaction.guild.id)
+        cache = self.guilds.snapshot()
+        known = len(self._guild_selectors)
+
+        largest = []
+        for guild_id, size in self.guilds.footprints()[:10]:
+            guild = self.bot.get_guild(guild_id)
+            largest.append(f"{guild.name if guild else guild_id}: **{size / 1024:.1f} KiB**")
+
+        embed = Embed(color=nextcord.Color.blue(), title="🧠 Role selector memory")
+        embed.add_field(
+            name="Guild cache",
+            value=f"Loaded: **{cache['guilds']}** of {known} guilds with selectors | Size: **{cache['bytes'] / 1024:.1f} KiB** of {cache['budget'] / 1024:.0f} KiB",
+            inline=False
+        )
+        embed.add_field(
+            name="Activity",
+            value=f"Hits: **{cache['hits']}** | Loads: **{cache['loads']}** | Evictions: **{cache['evictions']}** | Indexed messages: **{len(self._message_guilds)}**",
+            inline=False
+        )
+        embed.add_field(
+            name="This server",
+            value=f"{len(guild_config.messages)} selectors, **{guild_config.footprint() / 1024:.1f} KiB**" if guild_config else "No selectors.",
+            inline=False
+        )
+        pruned = self.pruner.stats
+        embed.add_field(
+            name="Pruned",
+            value=f"Guilds: **{pruned['guilds']}** | Selectors: **{pruned['messages']}** | Roles: **{pruned['bindings']}** | Audits: **{pruned['audits']}**",
+            inline=False
+        )
+        embed.add_field(name="Largest loaded guilds", value="\n".join(largest) or "None loaded.", inline=False)
+        embed.add_field(
+            name="Members",
+            value=f"Gateway cache: **{sum(len(guild.members) for guild in self.bot.guilds)}** | Selector cache: **{len(self.members)}** of {self.members.max_size}",
+            inline=False
+        )
+        if resource is not None:
+            embed.add_field(name="Process", value=f"Peak RSS: **{resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MiB**", inline=False)
+
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
 def setup(bot):
+    start_logging(_log_levels, sample_rate=_log_sample_rate, sample_burst=_log_sample_burst)
     bot.add_cog(ReactionRoles(bot))
-    print('The rolechanger module is loaded.')
\ No newline at end of file
+    log.info('The rolechanger module is loaded.')
+
+def teardown(bot):
+    stop_logging()
\ No newline at end of file
@@ -0,0 +1,95 @@
+from logging.handlers import QueueHandler, QueueListener
+import logging
+import queue
+import sys
+import threading
+import time
+
+_fields = ("guild_id", "channel_id", "message_id", "user_id", "role_id", "action")
+
+
+class StructuredFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        fields = [f"{field}={getattr(record, field)}" for field in _fields if getattr(record, field, None) is not None]
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            fields.append(f"suppressed={suppressed}")
+        return f"{text} | {' '.join(fields)}" if fields else text
+
+
+class SuccessSampler(logging.Filter):
+    def __init__(self, rate: float = 5.0, burst: int = 20):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self._buckets: dict[tuple[str, str], list[float]] = {}
+        self._suppressed: dict[tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not getattr(record, "sampled", False):
+            return True
+
+        key = (record.name, getattr(record, "action", None) or "")
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(self.burst), now]
+            tokens = min(float(self.burst), bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if tokens < 1:
+                bucket[0] = tokens
+                self._suppressed[key] = self._suppressed.get(key, 0) + 1
+                return False
+            bucket[0] = tokens - 1
+            record.suppressed = self._suppressed.pop(key, 0)
+        return True
+
+
+class InProcessQueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+_listener: QueueListener | None = None
+_queue_handler: QueueHandler | None = None
+
+
+def start_logging(levels: dict[str, int], sample_rate: float = 5.0, sample_burst: int = 20, handlers: list[logging.Handler] | None = None):
+    global _listener, _queue_handler
+    if _listener is not None:
+        return
+
+    for name, level in levels.items():
+        logging.getLogger(name).setLevel(level)
+
+    if handlers is None:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(StructuredFormatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+        handlers = [handler]
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _queue_handler = InProcessQueueHandler(log_queue)
+    _queue_handler.addFilter(SuccessSampler(rate=sample_rate, burst=sample_burst))
+
+    logger = logging.getLogger('rolechanger')
+    logger.addHandler(_queue_handler)
+    logger.propagate = False
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging():
+    global _listener, _queue_handler
+    if _listener is None:
+        return
+
+    logger = logging.getLogger('rolechanger')
+    logger.removeHandler(_queue_handler)
+    logger.propagate = True
+    _listener.stop()
+    _listener = None
+    _queue_handler = None
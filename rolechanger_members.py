@@ -0,0 +1,90 @@
+from collections import OrderedDict
+from typing import Callable
+import asyncio
+import time
+
+import nextcord
+
+
+class MemberResolver:
+    def __init__(self, max_size: int = 5000, ttl: float = 300.0, negative_ttl: float = 60.0, rest: Callable[[str], None] | None = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.rest = rest
+        self.stats = {"payload": 0, "gateway": 0, "hits": 0, "fetched": 0, "missing": 0, "negative_hits": 0, "evictions": 0}
+        self._members: OrderedDict[tuple[int, int], tuple[nextcord.Member, float]] = OrderedDict()
+        self._missing: dict[tuple[int, int], float] = {}
+        self._fetching: dict[tuple[int, int], asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._members)
+
+    async def resolve(self, guild: nextcord.Guild, user_id: int, member: nextcord.Member | None = None) -> nextcord.Member | None:
+        if member is not None:
+            self.stats["payload"] += 1
+            self.remember(member)
+            return member
+
+        member = guild.get_member(user_id)
+        if member is not None:
+            self.stats["gateway"] += 1
+            return member
+
+        key = (guild.id, user_id)
+        now = time.monotonic()
+        cached = self._members.get(key)
+        if cached is not None:
+            if cached[1] > now:
+                self._members.move_to_end(key)
+                self.stats["hits"] += 1
+                return cached[0]
+            del self._members[key]
+
+        missing_until = self._missing.get(key)
+        if missing_until is not None:
+            if missing_until > now:
+                self.stats["negative_hits"] += 1
+                return None
+            del self._missing[key]
+
+        fetching = self._fetching.get(key)
+        if fetching is None:
+            fetching = self._fetching[key] = asyncio.ensure_future(self._fetch(guild, user_id))
+            fetching.add_done_callback(lambda _: self._fetching.pop(key, None))
+        return await asyncio.shield(fetching)
+
+    async def _fetch(self, guild: nextcord.Guild, user_id: int) -> nextcord.Member | None:
+        if self.rest is not None:
+            self.rest('GET /guilds/{guild_id}/members/{user_id}')
+        try:
+            member = await guild.fetch_member(user_id)
+        except nextcord.NotFound:
+            self.stats["missing"] += 1
+            self.forget(guild.id, user_id, missing=True)
+            return None
+        self.stats["fetched"] += 1
+        self.remember(member)
+        return member
+
+    def remember(self, member: nextcord.Member):
+        key = (member.guild.id, member.id)
+        self._missing.pop(key, None)
+        self._members[key] = (member, time.monotonic() + self.ttl)
+        self._members.move_to_end(key)
+        while len(self._members) > self.max_size:
+            self._members.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def forget(self, guild_id: int, user_id: int, missing: bool = False):
+        key = (guild_id, user_id)
+        self._members.pop(key, None)
+        if missing:
+            self._missing[key] = time.monotonic() + self.negative_ttl
+            if len(self._missing) > self.max_size:
+                del self._missing[next(iter(self._missing))]
+        else:
+            self._missing.pop(key, None)
+
+    def snapshot(self) -> dict:
+        return {"cached": len(self._members), "missing_cached": len(self._missing), **self.stats}
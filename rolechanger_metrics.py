@@ -0,0 +1,143 @@
+from bisect import bisect_left
+from typing import Callable
+import asyncio
+import logging
+
+log = logging.getLogger('rolechanger')
+
+_buckets = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_help = {
+    "rolechanger_events_total": "Raw reaction events seen by the cog, by result.",
+    "rolechanger_stage_seconds": "Time spent in each stage of reaction handling.",
+    "rolechanger_rest_calls_total": "REST calls issued by the cog, by route.",
+    "rolechanger_command_seconds": "Slash command handling time, by command.",
+    "rolechanger_storage_write_seconds": "Time spent persisting the configuration.",
+    "rolechanger_storage_write_bytes_total": "Bytes written when persisting the configuration.",
+}
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(_buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(_buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, fraction: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return _buckets[index] if index < len(_buckets) else float('inf')
+        return float('inf')
+
+
+class Metrics:
+    def __init__(self):
+        self.counters: dict[tuple[str, tuple], float] = {}
+        self.histograms: dict[tuple[str, tuple], Histogram] = {}
+        self.collectors: list[Callable[[], dict[str, float]]] = []
+        self._server: asyncio.AbstractServer | None = None
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(labels.items()))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, tuple(labels.items()))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        histogram.observe(value)
+
+    def counter(self, name: str, **labels) -> float:
+        return self.counters.get((name, tuple(labels.items())), 0)
+
+    def histogram(self, name: str, **labels) -> Histogram | None:
+        return self.histograms.get((name, tuple(labels.items())))
+
+    def render(self) -> str:
+        lines = []
+        described = set()
+
+        def describe(name: str, kind: str):
+            if name not in described:
+                described.add(name)
+                if name in _help:
+                    lines.append(f'# HELP {name} {_help[name]}')
+                lines.append(f'# TYPE {name} {kind}')
+
+        for (name, labels), value in sorted(self.counters.items()):
+            describe(name, 'counter')
+            lines.append(f'{name}{_labels(labels)} {value}')
+
+        for (name, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+            describe(name, 'histogram')
+            cumulative = 0
+            for bound, count in zip(_buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels(labels + (("le", bound),))} {cumulative}')
+            lines.append(f'{name}_bucket{_labels(labels + (("le", "+Inf"),))} {histogram.count}')
+            lines.append(f'{name}_sum{_labels(labels)} {histogram.sum}')
+            lines.append(f'{name}_count{_labels(labels)} {histogram.count}')
+
+        for collector in self.collectors:
+            for name, value in sorted(collector().items()):
+                describe(name, 'gauge')
+                lines.append(f'{name} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+    async def start_server(self, host: str, port: int):
+        if self._server is None:
+            self._server = await asyncio.start_server(self._handle, host, port)
+            log.info('The rolechanger metrics endpoint is listening on http://%s:%s/metrics.', host, port)
+
+    def stop_server(self):
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b'\r\n', b'\n', b''):
+                pass
+
+            parts = request_line.decode('latin-1').split()
+            if len(parts) >= 2 and parts[0] == 'GET' and parts[1].split('?')[0] == '/metrics':
+                status, body = '200 OK', self.render().encode('utf-8')
+            else:
+                status, body = '404 Not Found', b'Not Found\n'
+
+            writer.write(
+                f'HTTP/1.1 {status}\r\n'
+                f'Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n'
+                f'Content-Length: {len(body)}\r\n'
+                f'Connection: close\r\n\r\n'.encode('latin-1') + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+def _labels(labels: tuple) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -0,0 +1,163 @@
+from collections import OrderedDict
+import sys
+
+
+class RoleBinding:
+    __slots__ = ("role_id", "emote", "description")
+
+    def __init__(self, role_id: int, emote: str, description: str = ""):
+        self.role_id = role_id
+        self.emote = emote
+        self.description = description
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'RoleBinding':
+        return cls(data.get("role"), data.get("emote"), data.get("description", ""))
+
+    def to_dict(self) -> dict:
+        return {"role": self.role_id, "emote": self.emote, "description": self.description}
+
+    def footprint(self) -> int:
+        return sys.getsizeof(self) + sys.getsizeof(self.role_id) + sys.getsizeof(self.emote) + sys.getsizeof(self.description)
+
+
+class SelectorMessage:
+    __slots__ = ("message_id", "channel_id", "bindings", "mode", "limit", "title", "description", "color", "kind")
+
+    def __init__(
+        self, message_id: int, channel_id: int, bindings: list[RoleBinding] | None = None, mode: str = "normal", limit: int = 0,
+        title: str | None = None, description: str | None = None, color: int | None = None, kind: str = "reaction"
+    ):
+        self.message_id = message_id
+        self.channel_id = channel_id
+        self.bindings: dict[str, RoleBinding] = {binding.emote: binding for binding in bindings or ()}
+        self.mode = mode
+        self.limit = limit
+        self.title = title
+        self.description = description
+        self.color = color
+        self.kind = kind
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'SelectorMessage':
+        return cls(
+            data.get("message_id"), data.get("channel_id"),
+            [RoleBinding.from_dict(role_config) for role_config in data.get("roles", [])],
+            mode=data.get("mode", "normal"), limit=data.get("limit", 0),
+            title=data.get("title"), description=data.get("description"), color=data.get("color"),
+            kind=data.get("kind", "reaction")
+        )
+
+    def to_dict(self) -> dict:
+        data = {"message_id": self.message_id, "channel_id": self.channel_id, "roles": [binding.to_dict() for binding in self.bindings.values()]}
+        if self.mode != "normal":
+            data["mode"] = self.mode
+        if self.limit:
+            data["limit"] = self.limit
+        if self.kind != "reaction":
+            data["kind"] = self.kind
+        for key in ("title", "description", "color"):
+            if getattr(self, key) is not None:
+                data[key] = getattr(self, key)
+        return data
+
+    @property
+    def has_embed(self) -> bool:
+        return self.title is not None or self.description is not None
+
+    def emote_for(self, role_id: int) -> str | None:
+        return next((binding.emote for binding in self.bindings.values() if binding.role_id == role_id), None)
+
+    def footprint(self) -> int:
+        size = sys.getsizeof(self) + sys.getsizeof(self.message_id) + sys.getsizeof(self.channel_id) + sys.getsizeof(self.bindings)
+        size += sys.getsizeof(self.title) + sys.getsizeof(self.description) + sys.getsizeof(self.color)
+        return size + sum(binding.footprint() for binding in self.bindings.values())
+
+
+class GuildConfig:
+    __slots__ = ("guild_id", "messages")
+
+    def __init__(self, guild_id: int, messages: list[SelectorMessage] | None = None):
+        self.guild_id = guild_id
+        self.messages: dict[int, SelectorMessage] = {msg.message_id: msg for msg in messages or ()}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'GuildConfig':
+        return cls(data.get("guild_id"), [SelectorMessage.from_dict(msg) for msg in data.get("messages", [])])
+
+    def to_dict(self) -> dict:
+        return {"guild_id": self.guild_id, "messages": [msg.to_dict() for msg in self.messages.values()]}
+
+    def footprint(self) -> int:
+        size = sys.getsizeof(self) + sys.getsizeof(self.guild_id) + sys.getsizeof(self.messages)
+        return size + sum(msg.footprint() for msg in self.messages.values())
+
+
+class GuildCache:
+    def __init__(self, budget: int):
+        self.budget = budget
+        self.size = 0
+        self.stats = {"hits": 0, "loads": 0, "evictions": 0}
+        self._guilds: OrderedDict[int, GuildConfig] = OrderedDict()
+        self._sizes: dict[int, int] = {}
+        self._pinned: dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._guilds)
+
+    def __contains__(self, guild_id: int) -> bool:
+        return guild_id in self._guilds
+
+    def get(self, guild_id: int) -> GuildConfig | None:
+        guild = self._guilds.get(guild_id)
+        if guild is not None:
+            self._guilds.move_to_end(guild_id)
+            self.stats["hits"] += 1
+        return guild
+
+    def put(self, guild: GuildConfig):
+        if guild.guild_id not in self._guilds:
+            self.stats["loads"] += 1
+        self._guilds[guild.guild_id] = guild
+        self._guilds.move_to_end(guild.guild_id)
+        size = guild.footprint()
+        self.size += size - self._sizes.get(guild.guild_id, 0)
+        self._sizes[guild.guild_id] = size
+        self._evict()
+
+    def pin(self, guild_id: int):
+        self._pinned[guild_id] = self._pinned.get(guild_id, 0) + 1
+
+    def unpin(self, guild_id: int):
+        count = self._pinned.pop(guild_id, 0) - 1
+        if count > 0:
+            self._pinned[guild_id] = count
+        else:
+            self._evict()
+
+    def discard(self, guild_id: int):
+        if self._guilds.pop(guild_id, None) is not None:
+            self.size -= self._sizes.pop(guild_id)
+
+    def clear(self):
+        self._guilds.clear()
+        self._sizes.clear()
+        self.size = 0
+
+    def footprints(self) -> list[tuple[int, int]]:
+        return sorted(self._sizes.items(), key=lambda item: item[1], reverse=True)
+
+    def snapshot(self) -> dict:
+        return {"guilds": len(self._guilds), "bytes": self.size, "budget": self.budget, "pinned": len(self._pinned), **self.stats}
+
+    def _evict(self):
+        skipped = 0
+        while self.size > self.budget and len(self._guilds) - skipped > 1:
+            guild_id = next(iter(self._guilds))
+            if guild_id in self._pinned:
+                self._guilds.move_to_end(guild_id)
+                skipped += 1
+                continue
+            del self._guilds[guild_id]
+            self.size -= self._sizes.pop(guild_id)
+            self.stats["evictions"] += 1
@@ -0,0 +1,172 @@
+import asyncio
+import logging
+
+import nextcord
+
+from rolechanger_model import SelectorMessage
+
+log = logging.getLogger('rolechanger.prune')
+
+
+class Pruner:
+    def __init__(self, cog, interval: float = 6 * 3600.0, pause: float = 0.5):
+        self.cog = cog
+        self.interval = interval
+        self.pause = pause
+        self.stats = {"audits": 0, "guilds": 0, "messages": 0, "bindings": 0}
+        self._task: asyncio.Task | None = None
+        self._missing_guilds: set[int] = set()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if self.running:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self.running:
+            self._task.cancel()
+
+    async def prune_messages(self, guild_id: int, message_ids: list[int]) -> int:
+        cog = self.cog
+        message_ids = [message_id for message_id in message_ids if cog._message_guilds.get(message_id) == guild_id]
+        if not message_ids:
+            return 0
+
+        guild_config = await cog._get_guild(guild_id)
+        removed = [message_id for message_id in message_ids if guild_config is not None and guild_config.messages.pop(message_id, None) is not None]
+        for message_id in message_ids:
+            cog._unindex_message(message_id)
+            self._forget_render(message_id)
+        if not removed:
+            return 0
+
+        cog.guilds.put(guild_config)
+        cog.storage.messages_removed(guild_config, removed)
+        self.stats["messages"] += len(removed)
+        log.info('%s deleted selector messages were pruned.', len(removed), extra={"guild_id": guild_id, "action": "prune_messages"})
+        return len(removed)
+
+    async def prune_channel(self, guild_id: int, channel_id: int) -> int:
+        if not self.cog._guild_selectors.get(guild_id):
+            return 0
+        guild_config = await self.cog._get_guild(guild_id)
+        if guild_config is None:
+            return 0
+        return await self.prune_messages(guild_id, [msg.message_id for msg in guild_config.messages.values() if msg.channel_id == channel_id])
+
+    async def prune_role(self, guild_id: int, role_id: int) -> int:
+        cog = self.cog
+        if not cog._guild_selectors.get(guild_id):
+            return 0
+        guild_config = await cog._get_guild(guild_id)
+        if guild_config is None:
+            return 0
+
+        removed: list[tuple[SelectorMessage, str]] = []
+        for msg in guild_config.messages.values():
+            for emote, binding in list(msg.bindings.items()):
+                if binding.role_id == role_id:
+                    del msg.bindings[emote]
+                    removed.append((msg, emote))
+        if not removed:
+            return 0
+
+        cog.guilds.put(guild_config)
+        cog.storage.roles_removed(guild_config, removed)
+        self.stats["bindings"] += len(removed)
+        for msg in {msg.message_id: msg for msg, _ in removed}.values():
+            cog._render_later(guild_id, msg)
+        log.info('%s bindings of a deleted role were pruned.', len(removed), extra={"guild_id": guild_id, "role_id": role_id, "action": "prune_role"})
+        await self._clear_reactions(guild_id, removed)
+        return len(removed)
+
+    async def prune_guild(self, guild_id: int) -> int:
+        cog = self.cog
+        guild_config = await cog._get_guild(guild_id)
+        if guild_config is None:
+            return 0
+
+        for message_id in guild_config.messages:
+            cog._unindex_message(message_id)
+            self._forget_render(message_id)
+        cog.guilds.discard(guild_id)
+        cog.storage.guild_removed(guild_config)
+        self.stats["guilds"] += 1
+        self.stats["messages"] += len(guild_config.messages)
+        log.info('The data of a removed guild was pruned (%s selectors).', len(guild_config.messages), extra={"guild_id": guild_id, "action": "prune_guild"})
+        return len(guild_config.messages)
+
+    def _forget_render(self, message_id: int):
+        task = self.cog._renders.pop(message_id, None)
+        if task is not None:
+            task.cancel()
+        self.cog._drifted.pop(message_id, None)
+
+    async def _clear_reactions(self, guild_id: int, removed: list[tuple[SelectorMessage, str]]):
+        for msg, emote in removed:
+            message = self.cog._partial_selector(msg) if msg.kind == "reaction" else None
+            if message is None:
+                continue
+            try:
+                self.cog._rest('DELETE /channels/{channel_id}/messages/{message_id}/reactions/{emoji}')
+                await message.clear_reaction(emote)
+            except nextcord.NotFound:
+                pass
+            except nextcord.HTTPException as e:
+                log.warning('Could not remove the reaction of a pruned binding: %s', e, extra={"guild_id": guild_id, "message_id": msg.message_id, "action": "prune_role"})
+
+    async def _run(self):
+        await self.cog.bot.wait_until_ready()
+        while True:
+            try:
+                await self.audit()
+            except Exception:
+                log.exception('The selector audit failed.')
+            await asyncio.sleep(self.interval)
+
+    async def audit(self):
+        self.stats["audits"] += 1
+        missing = set()
+        for guild_id in list(self.cog._guild_selectors):
+            await asyncio.sleep(self.pause)
+            guild = self.cog.bot.get_guild(guild_id)
+            if guild is None:
+                if guild_id in self._missing_guilds:
+                    await self.prune_guild(guild_id)
+                else:
+                    missing.add(guild_id)
+            elif not guild.unavailable:
+                await self._audit_guild(guild)
+        self._missing_guilds = missing
+        log.info(
+            'Selector audit finished: %s guilds, %s selectors and %s bindings pruned so far.',
+            self.stats["guilds"], self.stats["messages"], self.stats["bindings"]
+        )
+
+    async def _audit_guild(self, guild: nextcord.Guild):
+        cog = self.cog
+        guild_config = cog.guilds.get(guild.id) if guild.id in cog.guilds else await cog.storage.load_guild(guild.id)
+        if guild_config is None:
+            return
+
+        for role_id in {binding.role_id for msg in guild_config.messages.values() for binding in msg.bindings.values()}:
+            if guild.get_role(role_id) is None:
+                await self.prune_role(guild.id, role_id)
+
+        for channel_id in {msg.channel_id for msg in guild_config.messages.values()}:
+            if guild.get_channel_or_thread(channel_id) is None and await self._channel_deleted(channel_id):
+                await self.prune_channel(guild.id, channel_id)
+
+    async def _channel_deleted(self, channel_id: int) -> bool:
+        try:
+            self.cog._rest('GET /channels/{channel_id}')
+            await self.cog.bot.fetch_channel(channel_id)
+        except nextcord.NotFound:
+            return True
+        except nextcord.HTTPException:
+            return False
+        return False
@@ -0,0 +1,137 @@
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable
+import asyncio
+import logging
+import nextcord
+
+log = logging.getLogger('rolechanger.queue')
+
+
+class RoleChangeQueue:
+    def __init__(self, worker_count: int = 4, max_size: int = 10000, guild_max_size: int = 1000):
+        self.worker_count = worker_count
+        self.max_size = max_size
+        self.guild_max_size = guild_max_size
+        self.stats = {
+            "enqueued": 0,
+            "processed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "rate_limited": 0,
+            "max_depth": 0,
+            "wait_total": 0.0,
+            "wait_max": 0.0,
+        }
+        self._lanes: OrderedDict[int, deque] = OrderedDict()
+        self._size = 0
+        self._ready: asyncio.Event | None = None
+        self._paused_until = 0.0
+        self._workers: list[asyncio.Task] = []
+
+    @property
+    def depth(self) -> int:
+        return self._size
+
+    def lane_depth(self, guild_id: int) -> int:
+        lane = self._lanes.get(guild_id)
+        return len(lane) if lane is not None else 0
+
+    def lane_depths(self) -> dict[int, int]:
+        return {guild_id: len(lane) for guild_id, lane in self._lanes.items()}
+
+    def put(self, guild_id: int, job: Callable[[], Awaitable], attempt: int = 1, front: bool = False) -> bool:
+        lane = self._lanes.get(guild_id)
+        full = self._size >= self.max_size or (lane is not None and len(lane) >= self.guild_max_size)
+        if full and attempt == 1:
+            self.stats["rejected"] += 1
+            return False
+
+        self._ensure_workers()
+        if lane is None:
+            lane = self._lanes[guild_id] = deque()
+
+        item = (asyncio.get_running_loop().time(), job, attempt)
+        if front:
+            lane.appendleft(item)
+        else:
+            lane.append(item)
+
+        self._size += 1
+        self.stats["enqueued"] += 1
+        self.stats["max_depth"] = max(self.stats["max_depth"], self._size)
+        self._ready.set()
+        return True
+
+    def _ensure_workers(self):
+        if self._ready is None:
+            self._ready = asyncio.Event()
+        if not self._workers:
+            loop = asyncio.get_running_loop()
+            self._workers = [loop.create_task(self._worker()) for _ in range(self.worker_count)]
+
+    async def _next(self) -> tuple[int, float, Callable[[], Awaitable], int]:
+        while not self._lanes:
+            self._ready.clear()
+            await self._ready.wait()
+
+        guild_id, lane = self._lanes.popitem(last=False)
+        enqueued_at, job, attempt = lane.popleft()
+        if lane:
+            self._lanes[guild_id] = lane
+        self._size -= 1
+        return guild_id, enqueued_at, job, attempt
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            guild_id, enqueued_at, job, attempt = await self._next()
+
+            pause = self._paused_until - loop.time()
+            if pause > 0:
+                await asyncio.sleep(pause)
+
+            wait = loop.time() - enqueued_at
+            self.stats["wait_total"] += wait
+            self.stats["wait_max"] = max(self.stats["wait_max"], wait)
+
+            try:
+                await job()
+                self.stats["processed"] += 1
+            except nextcord.HTTPException as e:
+                if e.status != 429:
+                    self.stats["failed"] += 1
+                    log.error('Role change failed: %s', e, extra={"guild_id": guild_id})
+                    continue
+                self._rate_limited(guild_id, job, attempt, e)
+            except Exception:
+                self.stats["failed"] += 1
+                log.exception('Role change failed.', extra={"guild_id": guild_id})
+
+    def _rate_limited(self, guild_id: int, job: Callable[[], Awaitable], attempt: int, error: nextcord.HTTPException):
+        self.stats["rate_limited"] += 1
+        log.warning('Role change was rate limited (attempt %s).', attempt, extra={"guild_id": guild_id, "action": "rate_limited"})
+        headers = getattr(error.response, "headers", None) or {}
+        try:
+            retry_after = float(headers.get("Retry-After", 1.0))
+        except ValueError:
+            retry_after = 1.0
+
+        loop = asyncio.get_running_loop()
+        if headers.get("X-RateLimit-Global"):
+            self._paused_until = max(self._paused_until, loop.time() + retry_after)
+
+        loop.call_later(retry_after, lambda: self.put(guild_id, job, attempt=attempt + 1, front=True))
+
+    def snapshot(self) -> dict:
+        processed = self.stats["processed"] + self.stats["failed"]
+        return {
+            **self.stats,
+            "depth": self._size,
+            "guilds": len(self._lanes),
+            "wait_avg": self.stats["wait_total"] / processed if processed else 0.0,
+        }
+
+    def stop(self):
+        for task in self._workers:
+            task.cancel()
+        self._workers = []
@@ -0,0 +1,234 @@
+import asyncio
+import json
+import logging
+import os
+
+import nextcord
+
+from rolechanger_model import GuildConfig, RoleBinding, SelectorMessage
+
+log = logging.getLogger('rolechanger.reconcile')
+
+
+class Reconciler:
+    def __init__(self, cog, checkpoint_path: str = 'rolechanger_reconcile.json', concurrency: int = 4, remove_stale: bool = False, checkpoint_every: int = 100, max_pending: int = 500, page_size: int = 1000):
+        self.cog = cog
+        self.checkpoint_path = checkpoint_path
+        self.concurrency = concurrency
+        self.remove_stale = remove_stale
+        self.checkpoint_every = checkpoint_every
+        self.max_pending = max_pending
+        self.page_size = page_size
+        self.stats = {"sweeps": 0, "selectors": 0, "scanned": 0, "added": 0, "removed": 0, "resumed": 0}
+        self._task: asyncio.Task | None = None
+        self._completed: set[int] = set()
+        self._cursors: dict[str, int] = {}
+        self._queued: set[tuple[int, int]] = set()
+        self._rosters: dict[int, tuple[set[int], dict[int, set[int]]] | None] = {}
+        self._checkpoint_lock: asyncio.Lock | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if self.running:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._sweep())
+
+    def stop(self):
+        if self.running:
+            self._task.cancel()
+
+    def _load_checkpoint(self):
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as file:
+                checkpoint = json.load(file)
+            self._completed = set(checkpoint.get("completed", []))
+            self._cursors = {key: int(value) for key, value in checkpoint.get("cursors", {}).items()}
+            if self._completed or self._cursors:
+                self.stats["resumed"] += 1
+                log.info('Resuming reconciliation: %s selectors already done, %s bindings in progress.', len(self._completed), len(self._cursors))
+        except FileNotFoundError:
+            self._completed, self._cursors = set(), {}
+        except (json.JSONDecodeError, ValueError, AttributeError):
+            log.warning('The reconciliation checkpoint (%s) is unreadable, starting a full sweep.', self.checkpoint_path)
+            self._completed, self._cursors = set(), {}
+
+    def _write_checkpoint(self, checkpoint: dict | None):
+        if checkpoint is None:
+            try:
+                os.remove(self.checkpoint_path)
+            except FileNotFoundError:
+                pass
+            return
+
+        temp_path = f'{self.checkpoint_path}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(checkpoint, file)
+        os.replace(temp_path, self.checkpoint_path)
+
+    async def _save_checkpoint(self, done: bool = False):
+        if self._checkpoint_lock is None:
+            self._checkpoint_lock = asyncio.Lock()
+        checkpoint = None if done else {"completed": sorted(self._completed), "cursors": dict(self._cursors)}
+        if checkpoint is not None:
+            await self._applied(set(self._queued))
+        async with self._checkpoint_lock:
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self._write_checkpoint, checkpoint)
+            except OSError as e:
+                log.error('Could not write the reconciliation checkpoint: %s', e)
+
+    async def _sweep(self):
+        await self.cog.bot.wait_until_ready()
+        self._load_checkpoint()
+        self.stats["sweeps"] += 1
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run(guild_id: int):
+            async with semaphore:
+                guild_config = await self.cog._get_guild(guild_id)
+                if guild_config is not None:
+                    await self._reconcile_guild(guild_config)
+
+        await asyncio.gather(*(run(guild_id) for guild_id in list(self.cog._guild_selectors)))
+        await self._save_checkpoint(done=True)
+        self._completed, self._cursors = set(), {}
+        log.info('Reconciliation finished: %s reactors scanned, %s roles added, %s roles removed.', self.stats["scanned"], self.stats["added"], self.stats["removed"])
+
+    async def _reconcile_guild(self, guild_config: GuildConfig):
+        guild = self.cog.bot.get_guild(guild_config.guild_id)
+        if guild is None:
+            return
+
+        try:
+            for msg in list(guild_config.messages.values()):
+                if msg.message_id in self._completed or not msg.bindings or msg.mode == "remove" or msg.kind != "reaction":
+                    continue
+                try:
+                    await self._reconcile_message(guild, guild_config, msg)
+                except nextcord.HTTPException as e:
+                    log.warning('Could not reconcile the selector: %s', e, extra={"guild_id": guild.id, "message_id": msg.message_id, "action": "reconcile"})
+                self._completed.add(msg.message_id)
+                self.stats["selectors"] += 1
+                await self._save_checkpoint()
+        finally:
+            self._rosters.pop(guild.id, None)
+
+    async def _reconcile_message(self, guild: nextcord.Guild, guild_config: GuildConfig, msg: SelectorMessage):
+        channel = self.cog.bot.get_channel(msg.channel_id)
+        if channel is None:
+            return
+
+        try:
+            self.cog._rest('GET /channels/{channel_id}/messages/{message_id}')
+            message = await channel.fetch_message(msg.message_id)
+        except nextcord.NotFound:
+            await self.cog.pruner.prune_messages(guild.id, [msg.message_id])
+            return
+
+        reactions = {str(reaction.emoji): reaction for reaction in message.reactions}
+        for binding in list(msg.bindings.values()):
+            role = guild.get_role(binding.role_id)
+            reaction = reactions.get(binding.emote)
+            if role is None or reaction is None:
+                continue
+            await self._reconcile_binding(guild, guild_config, msg, binding, role, reaction)
+
+    async def _reconcile_binding(self, guild: nextcord.Guild, guild_config: GuildConfig, msg: SelectorMessage, binding: RoleBinding, role: nextcord.Role, reaction: nextcord.Reaction):
+        key = f'{msg.message_id}|{binding.emote}'
+        after = self._cursors.get(key)
+        roster = await self._roster(guild, guild_config, reaction)
+        holders = roster[1][role.id] if roster is not None else None
+        check_stale = self.remove_stale and after is None and msg.mode != "verify" and holders is not None and self._bound_once(guild_config, role.id)
+        reactors: set[int] = set()
+        since_checkpoint = 0
+
+        async for user in reaction.users(after=nextcord.Object(id=after) if after else None):
+            if not user.bot:
+                self.stats["scanned"] += 1
+                if check_stale:
+                    reactors.add(user.id)
+                if roster is None or (user.id in roster[0] and user.id not in holders):
+                    await self._grant(guild, user, role, msg)
+
+            self._cursors[key] = user.id
+            since_checkpoint += 1
+            if since_checkpoint >= self.checkpoint_every:
+                since_checkpoint = 0
+                await self._save_checkpoint()
+
+        if check_stale:
+            for member_id in holders - reactors:
+                member = await self.cog.members.resolve(guild, member_id)
+                if member is not None and not member.bot:
+                    await self._wait_for_capacity(guild.id)
+                    self._queue(guild, member, role, False, msg)
+
+        self._cursors.pop(key, None)
+
+    async def _grant(self, guild: nextcord.Guild, user: nextcord.abc.User, role: nextcord.Role, msg: SelectorMessage):
+        member = user if isinstance(user, nextcord.Member) else await self.cog.members.resolve(guild, user.id)
+        if member is None or member.get_role(role.id) is not None:
+            return
+        await self._wait_for_capacity(guild.id)
+        self._queue(guild, member, role, True, msg)
+
+    async def _roster(self, guild: nextcord.Guild, guild_config: GuildConfig, reaction: nextcord.Reaction) -> tuple[set[int], dict[int, set[int]]] | None:
+        if guild.id in self._rosters:
+            return self._rosters[guild.id]
+        if not guild.chunked and (not self.cog.bot.intents.members or reaction.count * self.page_size < (guild.member_count or 0)):
+            return None
+
+        role_ids = {binding.role_id for msg in guild_config.messages.values() for binding in msg.bindings.values()}
+        members: set[int] = set()
+        holders: dict[int, set[int]] = {role_id: set() for role_id in role_ids}
+
+        def add(member: nextcord.Member):
+            members.add(member.id)
+            for role_id in role_ids:
+                if member.get_role(role_id) is not None:
+                    holders[role_id].add(member.id)
+
+        if guild.chunked:
+            for member in guild.members:
+                add(member)
+        else:
+            try:
+                async for member in guild.fetch_members(limit=None):
+                    if len(members) % self.page_size == 0:
+                        self.cog._rest('GET /guilds/{guild_id}/members')
+                    add(member)
+            except nextcord.HTTPException as e:
+                log.warning('Could not list the members, resolving reactors one by one: %s', e, extra={"guild_id": guild.id, "action": "reconcile"})
+                self._rosters[guild.id] = None
+                return None
+
+        self._rosters[guild.id] = members, holders
+        return self._rosters[guild.id]
+
+    async def _applied(self, keys: set[tuple[int, int]]):
+        while True:
+            self._queued = {key for key in self._queued if self.cog._edit_outstanding(key)}
+            if not keys & self._queued:
+                return
+            await asyncio.sleep(0.5)
+
+    def _queue(self, guild: nextcord.Guild, member: nextcord.Member, role: nextcord.Role, is_add: bool, msg: SelectorMessage):
+        self.cog._queue_role_change(guild, member, role.id, is_add, msg)
+        self._queued.add((guild.id, member.id))
+        self.stats["added" if is_add else "removed"] += 1
+
+    def _bound_once(self, guild_config: GuildConfig, role_id: int) -> bool:
+        return sum(binding.role_id == role_id for msg in guild_config.messages.values() for binding in msg.bindings.values()) == 1
+
+    async def _wait_for_capacity(self, guild_id: int):
+        queue = self.cog.queue
+        while (
+            queue.lane_depth(guild_id) >= queue.guild_max_size // 2
+            or queue.depth >= queue.max_size // 2
+            or len(self.cog._pending_edits) >= self.max_pending
+        ):
+            await asyncio.sleep(0.5)
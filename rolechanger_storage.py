@@ -0,0 +1,565 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+import asyncio
+import glob
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from rolechanger_model import GuildConfig, RoleBinding, SelectorMessage
+
+log = logging.getLogger('rolechanger.storage')
+
+
+def shard_of(guild_id: int, shard_count: int) -> int:
+    return (guild_id >> 22) % shard_count
+
+
+def _encode(guild_data: dict) -> str:
+    return json.dumps(guild_data, ensure_ascii=False, separators=(',', ':'))
+
+
+def _shard_generations(path: str) -> dict[int, dict[int, str]]:
+    base, extension = os.path.splitext(path)
+    file_name = re.compile(re.escape(os.path.basename(base)) + r'\.shard(\d+)-of-(\d+)' + re.escape(extension) + '$')
+    generations: dict[int, dict[int, str]] = {}
+    for file in glob.glob(f'{glob.escape(base)}.shard*-of-*{extension}'):
+        match = file_name.match(os.path.basename(file))
+        if match:
+            shard_id, shard_count = map(int, match.groups())
+            generations.setdefault(shard_count, {})[shard_id] = file
+    return generations
+
+
+def _newest_source(path: str, generations: dict[int, dict[int, str]], exclude: int | None = None) -> list[str]:
+    candidates = []
+    for shard_count, files in generations.items():
+        if shard_count != exclude and set(files) == set(range(shard_count)):
+            candidates.append((max(map(os.path.getmtime, files.values())), sorted(files.values())))
+    if os.path.exists(path):
+        candidates.append((os.path.getmtime(path), [path]))
+    return max(candidates)[1] if candidates else []
+
+
+def _read_guilds(sources: list[str]) -> list[dict]:
+    guilds = []
+    for source in sources:
+        try:
+            with open(source, 'r', encoding='utf-8') as file:
+                guilds.extend(json.load(file).get("guilds", []))
+        except (OSError, json.JSONDecodeError) as e:
+            log.warning('Could not read %s while migrating the configuration: %s', source, e)
+    return guilds
+
+
+def _retire_file(path: str, reason: str):
+    target, attempt = f'{path}.migrated', 1
+    while os.path.exists(target):
+        target, attempt = f'{path}.migrated.{attempt}', attempt + 1
+    try:
+        os.replace(path, target)
+        log.info('%s was %s and renamed to %s.', path, reason, target)
+    except FileNotFoundError:
+        pass
+
+
+class Storage:
+    metrics = None
+
+    def load_index(self) -> dict[int, int]:
+        raise NotImplementedError
+
+    async def load_guild(self, guild_id: int) -> GuildConfig | None:
+        raise NotImplementedError
+
+    def guild_added(self, guild: GuildConfig):
+        raise NotImplementedError
+
+    def message_added(self, guild: GuildConfig, msg: SelectorMessage):
+        raise NotImplementedError
+
+    def message_updated(self, guild: GuildConfig, msg: SelectorMessage):
+        raise NotImplementedError
+
+    def message_removed(self, guild: GuildConfig, message_id: int):
+        raise NotImplementedError
+
+    def messages_removed(self, guild: GuildConfig, message_ids: list[int]):
+        raise NotImplementedError
+
+    def roles_added(self, guild: GuildConfig, msg: SelectorMessage, bindings: list[RoleBinding]):
+        raise NotImplementedError
+
+    def role_removed(self, guild: GuildConfig, msg: SelectorMessage, emote: str):
+        raise NotImplementedError
+
+    def roles_removed(self, guild: GuildConfig, removed: list[tuple[SelectorMessage, str]]):
+        raise NotImplementedError
+
+    def guild_removed(self, guild: GuildConfig):
+        raise NotImplementedError
+
+    async def flush(self):
+        raise NotImplementedError
+
+    def close(self):
+        raise NotImplementedError
+
+
+class JsonStorage(Storage):
+    def __init__(self, path: str = 'rolechanger_conf.json', save_delay: float = 2.0):
+        self.path = path
+        self.save_delay = save_delay
+        self.guilds: dict[int, str] = {}
+        self._dirty = False
+        self._save_task: asyncio.Task | None = None
+        self._save_lock: asyncio.Lock | None = None
+        self._write_lock = threading.Lock()
+
+    def load_index(self) -> dict[int, int]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+            log.info('The configuration file (%s) was loaded successfully.', self.path)
+        except FileNotFoundError:
+            log.warning('Configuration file (%s) not found. Creating new file.', self.path)
+            data = {"guilds": []}
+            self._save()
+        except json.JSONDecodeError:
+            log.error('Could not read configuration file (%s) (unformatted). It was kept as %s.corrupt, continuing with empty data.', self.path, self.path)
+            os.replace(self.path, f'{self.path}.corrupt')
+            data = {"guilds": []}
+            self._save()
+
+        self.guilds = {}
+        index = {}
+        for guild_data in data.get("guilds", []):
+            guild_id = guild_data.get("guild_id")
+            self.guilds[guild_id] = _encode(guild_data)
+            for msg in guild_data.get("messages", []):
+                index[msg.get("message_id")] = guild_id
+        return index
+
+    async def load_guild(self, guild_id: int) -> GuildConfig | None:
+        text = self.guilds.get(guild_id)
+        return GuildConfig.from_dict(json.loads(text)) if text is not None else None
+
+    def guild_added(self, guild: GuildConfig):
+        self._store(guild)
+
+    def message_added(self, guild: GuildConfig, msg: SelectorMessage):
+        self._store(guild)
+
+    def message_updated(self, guild: GuildConfig, msg: SelectorMessage):
+        self._store(guild)
+
+    def message_removed(self, guild: GuildConfig, message_id: int):
+        self._store(guild)
+
+    def messages_removed(self, guild: GuildConfig, message_ids: list[int]):
+        self._store(guild)
+
+    def roles_added(self, guild: GuildConfig, msg: SelectorMessage, bindings: list[RoleBinding]):
+        self._store(guild)
+
+    def role_removed(self, guild: GuildConfig, msg: SelectorMessage, emote: str):
+        self._store(guild)
+
+    def roles_removed(self, guild: GuildConfig, removed: list[tuple[SelectorMessage, str]]):
+        self._store(guild)
+
+    def guild_removed(self, guild: GuildConfig):
+        if self.guilds.pop(guild.guild_id, None) is not None:
+            self._save()
+
+    def _store(self, guild: GuildConfig):
+        self.guilds[guild.guild_id] = _encode(guild.to_dict())
+        self._save()
+
+    def _save(self):
+        self._dirty = True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._dirty = False
+            self._write(self._snapshot())
+            return
+
+        if self._save_task is None or self._save_task.done():
+            self._save_task = loop.create_task(self._save_later())
+
+    async def _save_later(self):
+        while self._dirty:
+            await asyncio.sleep(self.save_delay)
+            await self.flush()
+
+    async def flush(self):
+        if self._save_lock is None:
+            self._save_lock = asyncio.Lock()
+
+        async with self._save_lock:
+            if not self._dirty:
+                return
+            self._dirty = False
+            snapshot = self._snapshot()
+            if not await asyncio.get_running_loop().run_in_executor(None, self._write, snapshot):
+                self._dirty = True
+
+    def close(self):
+        if self._save_task and not self._save_task.done():
+            self._save_task.cancel()
+        if self._dirty:
+            self._dirty = False
+            self._write(self._snapshot())
+
+    def _snapshot(self) -> list[str]:
+        return list(self.guilds.values())
+
+    def _write(self, guilds: list[str]) -> bool:
+        temp_path = f'{self.path}.tmp'
+        with self._write_lock:
+            try:
+                started = time.perf_counter()
+                with open(temp_path, 'w', encoding='utf-8') as file:
+                    file.write('{"guilds": [\n' + ',\n'.join(guilds) + '\n]}\n' if guilds else '{"guilds": []}\n')
+                    file.flush()
+                    os.fsync(file.fileno())
+                    size = os.fstat(file.fileno()).st_size
+                os.replace(temp_path, self.path)
+                if self.metrics is not None:
+                    self.metrics.observe('rolechanger_storage_write_seconds', time.perf_counter() - started, backend='json')
+                    self.metrics.inc('rolechanger_storage_write_bytes_total', size, backend='json')
+                log.debug('The configuration file (%s) has been saved.', self.path, extra={"action": "save", "sampled": True})
+                return True
+            except Exception as e:
+                log.error('Failed to save configuration file: %s', e, extra={"action": "save"})
+                return False
+
+
+class UnshardedJsonStorage(JsonStorage):
+    def load_index(self) -> dict[int, int]:
+        generations = _shard_generations(self.path)
+        if generations:
+            self._merge_shards(generations)
+        elif not os.path.exists(self.path) and glob.glob(f'{glob.escape(self.path)}.migrated*'):
+            raise RuntimeError(f'{self.path} was migrated to shard files that no longer exist; restore it from {self.path}.migrated instead of starting empty.')
+        return super().load_index()
+
+    def _merge_shards(self, generations: dict[int, dict[int, str]]):
+        sources = _newest_source(self.path, generations)
+        if not sources:
+            raise RuntimeError(f'{self.path} is missing and no shard generation is complete; refusing to start with an empty configuration.')
+        if sources != [self.path]:
+            guilds = [_encode(guild_data) for guild_data in _read_guilds(sources)]
+            if not self._write(guilds):
+                raise RuntimeError(f'Could not merge {len(sources)} shard files into {self.path}.')
+            log.info('The configuration was merged from %s shard files (%s guilds) into %s.', len(sources), len(guilds), self.path)
+
+        for files in generations.values():
+            for path in files.values():
+                _retire_file(path, 'superseded by the unsharded configuration')
+
+
+class SqliteStorage(Storage):
+    _schema = '''
+        CREATE TABLE IF NOT EXISTS guilds (
+            guild_id INTEGER PRIMARY KEY
+        );
+        CREATE TABLE IF NOT EXISTS messages (
+            message_id INTEGER PRIMARY KEY,
+            guild_id INTEGER NOT NULL,
+            channel_id INTEGER NOT NULL,
+            mode TEXT NOT NULL DEFAULT 'normal',
+            role_limit INTEGER NOT NULL DEFAULT 0,
+            title TEXT,
+            description TEXT,
+            color INTEGER,
+            kind TEXT NOT NULL DEFAULT 'reaction'
+        );
+        CREATE INDEX IF NOT EXISTS messages_guild_id ON messages (guild_id);
+        CREATE TABLE IF NOT EXISTS roles (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            message_id INTEGER NOT NULL,
+            emote TEXT NOT NULL,
+            role_id INTEGER NOT NULL,
+            description TEXT NOT NULL DEFAULT '',
+            UNIQUE (message_id, emote)
+        );
+    '''
+
+    def __init__(self, path: str = 'rolechanger.db', import_from: str | None = None, shard_ids: list[int] | None = None, shard_count: int | None = None):
+        self.path = path
+        self.import_from = import_from
+        self.shard_ids = shard_ids
+        self.shard_count = shard_count
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='rolechanger-sqlite')
+        self._pending: set[Future] = set()
+        self._connection: sqlite3.Connection | None = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('PRAGMA synchronous=NORMAL')
+            self._connection.executescript(self._schema)
+            self._migrate(self._connection)
+        return self._connection
+
+    _message_columns = (
+        ('mode', "TEXT NOT NULL DEFAULT 'normal'"),
+        ('role_limit', 'INTEGER NOT NULL DEFAULT 0'),
+        ('title', 'TEXT'),
+        ('description', 'TEXT'),
+        ('color', 'INTEGER'),
+        ('kind', "TEXT NOT NULL DEFAULT 'reaction'"),
+    )
+
+    def _migrate(self, connection: sqlite3.Connection):
+        columns = {row[1] for row in connection.execute('PRAGMA table_info(messages)')}
+        with connection:
+            for name, definition in self._message_columns:
+                if name not in columns:
+                    connection.execute(f'ALTER TABLE messages ADD COLUMN {name} {definition}')
+
+    def load_index(self) -> dict[int, int]:
+        return self._executor.submit(self._load_index).result()
+
+    def _load_index(self) -> dict[int, int]:
+        connection = self._connect()
+        if self.import_from and not connection.execute('SELECT 1 FROM guilds LIMIT 1').fetchone():
+            if os.path.exists(self.import_from):
+                self._import_json(self.import_from, only_if_empty=True)
+
+        where, params = self._shard_filter('guild_id')
+        index = dict(connection.execute(f'SELECT message_id, guild_id FROM messages{where}', params))
+        log.info('The configuration database (%s) was loaded successfully.', self.path)
+        return index
+
+    async def load_guild(self, guild_id: int) -> GuildConfig | None:
+        return await asyncio.wrap_future(self._executor.submit(self._load_guild, guild_id))
+
+    def _load_guild(self, guild_id: int) -> GuildConfig | None:
+        connection = self._connect()
+        messages = [
+            SelectorMessage(message_id, channel_id, mode=mode, limit=role_limit, title=title, description=description, color=color, kind=kind)
+            for message_id, channel_id, mode, role_limit, title, description, color, kind in connection.execute(
+                'SELECT message_id, channel_id, mode, role_limit, title, description, color, kind FROM messages WHERE guild_id = ? ORDER BY rowid', (guild_id,)
+            )
+        ]
+        if not messages and not connection.execute('SELECT 1 FROM guilds WHERE guild_id = ?', (guild_id,)).fetchone():
+            return None
+
+        guild = GuildConfig(guild_id, messages)
+        for message_id, emote, role_id, description in connection.execute(
+            'SELECT roles.message_id, emote, role_id, roles.description FROM roles JOIN messages ON messages.message_id = roles.message_id WHERE messages.guild_id = ? ORDER BY roles.id',
+            (guild_id,)
+        ):
+            guild.messages[message_id].bindings[emote] = RoleBinding(role_id, emote, description)
+        return guild
+
+    def _shard_filter(self, column: str) -> tuple[str, tuple]:
+        if not self.shard_count or self.shard_ids is None:
+            return '', ()
+        placeholders = ', '.join('?' for _ in self.shard_ids)
+        return f' WHERE (({column} >> 22) % ?) IN ({placeholders})', (self.shard_count, *self.shard_ids)
+
+    def import_json(self, path: str):
+        self._executor.submit(self._import_json, path).result()
+
+    def _import_json(self, path: str, only_if_empty: bool = False):
+        with open(path, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+
+        connection = self._connect()
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            if only_if_empty and connection.execute('SELECT 1 FROM guilds LIMIT 1').fetchone():
+                return
+            for guild_data in data.get("guilds", []):
+                guild_id = guild_data.get("guild_id")
+                connection.execute('INSERT OR IGNORE INTO guilds (guild_id) VALUES (?)', (guild_id,))
+                for msg in guild_data.get("messages", []):
+                    connection.execute(
+                        'INSERT OR REPLACE INTO messages (message_id, guild_id, channel_id, mode, role_limit, title, description, color, kind) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                        (
+                            msg.get("message_id"), guild_id, msg.get("channel_id"), msg.get("mode", "normal"), msg.get("limit", 0),
+                            msg.get("title"), msg.get("description"), msg.get("color"), msg.get("kind", "reaction")
+                        )
+                    )
+                    for role_config in msg.get("roles", []):
+                        connection.execute(
+                            'INSERT OR REPLACE INTO roles (message_id, emote, role_id, description) VALUES (?, ?, ?, ?)',
+                            (msg.get("message_id"), role_config.get("emote"), role_config.get("role"), role_config.get("description", ""))
+                        )
+        log.info('The configuration file (%s) was imported into %s.', path, self.path)
+
+    def _submit(self, *statements: tuple[str, tuple]):
+        future = self._executor.submit(self._execute, statements)
+        self._pending.add(future)
+        future.add_done_callback(self._pending.discard)
+
+    def _execute(self, statements: tuple[tuple[str, tuple], ...]):
+        try:
+            started = time.perf_counter()
+            with self._connect() as connection:
+                for sql, params in statements:
+                    connection.execute(sql, params)
+            if self.metrics is not None:
+                self.metrics.observe('rolechanger_storage_write_seconds', time.perf_counter() - started, backend='sqlite')
+        except Exception as e:
+            log.error('Failed to write to configuration database: %s', e, extra={"action": "save"})
+
+    def guild_added(self, guild: GuildConfig):
+        self._submit(('INSERT OR IGNORE INTO guilds (guild_id) VALUES (?)', (guild.guild_id,)))
+
+    def message_added(self, guild: GuildConfig, msg: SelectorMessage):
+        self._submit((
+            'INSERT OR REPLACE INTO messages (message_id, guild_id, channel_id, mode, role_limit, title, description, color, kind) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (msg.message_id, guild.guild_id, msg.channel_id, msg.mode, msg.limit, msg.title, msg.description, msg.color, msg.kind)
+        ))
+
+    def message_updated(self, guild: GuildConfig, msg: SelectorMessage):
+        self._submit((
+            'UPDATE messages SET mode = ?, role_limit = ?, title = ?, description = ?, color = ?, kind = ? WHERE message_id = ?',
+            (msg.mode, msg.limit, msg.title, msg.description, msg.color, msg.kind, msg.message_id)
+        ))
+
+    def message_removed(self, guild: GuildConfig, message_id: int):
+        self._submit(
+            ('DELETE FROM roles WHERE message_id = ?', (message_id,)),
+            ('DELETE FROM messages WHERE message_id = ?', (message_id,))
+        )
+
+    def messages_removed(self, guild: GuildConfig, message_ids: list[int]):
+        self._submit(*(
+            statement
+            for message_id in message_ids
+            for statement in (('DELETE FROM roles WHERE message_id = ?', (message_id,)), ('DELETE FROM messages WHERE message_id = ?', (message_id,)))
+        ))
+
+    def roles_added(self, guild: GuildConfig, msg: SelectorMessage, bindings: list[RoleBinding]):
+        self._submit(*(
+            (
+                'INSERT OR REPLACE INTO roles (message_id, emote, role_id, description) VALUES (?, ?, ?, ?)',
+                (msg.message_id, binding.emote, binding.role_id, binding.description)
+            )
+            for binding in bindings
+        ))
+
+    def role_removed(self, guild: GuildConfig, msg: SelectorMessage, emote: str):
+        self._submit(('DELETE FROM roles WHERE message_id = ? AND emote = ?', (msg.message_id, emote)))
+
+    def roles_removed(self, guild: GuildConfig, removed: list[tuple[SelectorMessage, str]]):
+        self._submit(*(('DELETE FROM roles WHERE message_id = ? AND emote = ?', (msg.message_id, emote)) for msg, emote in removed))
+
+    def guild_removed(self, guild: GuildConfig):
+        self._submit(
+            ('DELETE FROM roles WHERE message_id IN (SELECT message_id FROM messages WHERE guild_id = ?)', (guild.guild_id,)),
+            ('DELETE FROM messages WHERE guild_id = ?', (guild.guild_id,)),
+            ('DELETE FROM guilds WHERE guild_id = ?', (guild.guild_id,))
+        )
+
+    async def flush(self):
+        pending = list(self._pending)
+        if pending:
+            await asyncio.gather(*(asyncio.wrap_future(future) for future in pending))
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+class ShardedJsonStorage(Storage):
+    def __init__(self, path: str, shard_ids: list[int], shard_count: int, save_delay: float = 2.0):
+        self.path = path
+        self.shard_count = shard_count
+        base, extension = os.path.splitext(path)
+        self.partitions = {
+            shard_id: JsonStorage(f'{base}.shard{shard_id}-of-{shard_count}{extension}', save_delay=save_delay)
+            for shard_id in shard_ids
+        }
+
+    @property
+    def metrics(self):
+        return next(iter(self.partitions.values())).metrics if self.partitions else None
+
+    @metrics.setter
+    def metrics(self, metrics):
+        for storage in self.partitions.values():
+            storage.metrics = metrics
+
+    def _partition(self, guild_id: int) -> JsonStorage:
+        return self.partitions[shard_of(guild_id, self.shard_count)]
+
+    def load_index(self) -> dict[int, int]:
+        sources = None
+        index = {}
+        for shard_id, storage in self.partitions.items():
+            if not os.path.exists(storage.path):
+                if sources is None:
+                    sources = self._seed_sources()
+                self._seed(shard_id, storage, sources)
+            index.update(storage.load_index())
+        self._retire()
+        return index
+
+    async def load_guild(self, guild_id: int) -> GuildConfig | None:
+        return await self._partition(guild_id).load_guild(guild_id)
+
+    def _seed_sources(self) -> list[str]:
+        return _newest_source(self.path, _shard_generations(self.path), exclude=self.shard_count)
+
+    def _seed(self, shard_id: int, storage: JsonStorage, sources: list[str]):
+        guilds = [_encode(guild_data) for guild_data in _read_guilds(sources) if shard_of(guild_data.get("guild_id"), self.shard_count) == shard_id]
+        if storage._write(guilds):
+            log.info('The configuration of shard %s was seeded with %s guilds from %s files.', shard_id, len(guilds), len(sources))
+
+    def _retire(self):
+        generations = _shard_generations(self.path)
+        if set(generations.get(self.shard_count, {})) != set(range(self.shard_count)):
+            return
+
+        retired = [path for shard_count, files in generations.items() if shard_count != self.shard_count for path in files.values()]
+        if os.path.exists(self.path):
+            retired.append(self.path)
+        for path in retired:
+            _retire_file(path, f'migrated to {self.shard_count} shards')
+
+    def guild_added(self, guild: GuildConfig):
+        self._partition(guild.guild_id).guild_added(guild)
+
+    def message_added(self, guild: GuildConfig, msg: SelectorMessage):
+        self._partition(guild.guild_id).message_added(guild, msg)
+
+    def message_updated(self, guild: GuildConfig, msg: SelectorMessage):
+        self._partition(guild.guild_id).message_updated(guild, msg)
+
+    def message_removed(self, guild: GuildConfig, message_id: int):
+        self._partition(guild.guild_id).message_removed(guild, message_id)
+
+    def messages_removed(self, guild: GuildConfig, message_ids: list[int]):
+        self._partition(guild.guild_id).messages_removed(guild, message_ids)
+
+    def roles_added(self, guild: GuildConfig, msg: SelectorMessage, bindings: list[RoleBinding]):
+        self._partition(guild.guild_id).roles_added(guild, msg, bindings)
+
+    def role_removed(self, guild: GuildConfig, msg: SelectorMessage, emote: str):
+        self._partition(guild.guild_id).role_removed(guild, msg, emote)
+
+    def roles_removed(self, guild: GuildConfig, removed: list[tuple[SelectorMessage, str]]):
+        self._partition(guild.guild_id).roles_removed(guild, removed)
+
+    def guild_removed(self, guild: GuildConfig):
+        self._partition(guild.guild_id).guild_removed(guild)
+
+    async def flush(self):
+        await asyncio.gather(*(storage.flush() for storage in self.partitions.values()))
+
+    def close(self):
+        for storage in self.partitions.values():
+            storage.close()
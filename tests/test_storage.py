@@ -0,0 +1,79 @@
+import json
+import os
+import tempfile
+import unittest
+
+from rolechanger_model import GuildConfig, SelectorMessage
+from rolechanger_storage import ShardedJsonStorage, UnshardedJsonStorage, shard_of
+
+GUILDS = [(1 << 22) * shard for shard in range(1, 5)]
+
+
+class ShardMigrationTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'rolechanger_conf.json')
+        with open(self.path, 'w', encoding='utf-8') as file:
+            json.dump({"guilds": [{"guild_id": guild_id, "messages": [{"message_id": guild_id + 1, "channel_id": 1, "roles": []}]} for guild_id in GUILDS]}, file)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def files(self) -> set[str]:
+        return set(os.listdir(self.directory.name))
+
+    def sharded(self, shard_count: int) -> dict[int, int]:
+        index = {}
+        for shard_id in range(shard_count):
+            storage = ShardedJsonStorage(self.path, [shard_id], shard_count)
+            index.update(storage.load_index())
+            storage.close()
+        return index
+
+    def test_round_trip_keeps_data(self):
+        self.assertEqual(set(self.sharded(2).values()), set(GUILDS))
+        self.assertNotIn('rolechanger_conf.json', self.files())
+        self.assertIn('rolechanger_conf.json.migrated', self.files())
+
+        storage = UnshardedJsonStorage(self.path)
+        self.assertEqual(set(storage.load_index().values()), set(GUILDS))
+        self.assertFalse({name for name in self.files() if name.endswith('-of-2.json')})
+        storage.message_added(GuildConfig(GUILDS[0], [SelectorMessage(99, 2)]), SelectorMessage(99, 2))
+        storage.close()
+
+        index = self.sharded(2)
+        self.assertEqual(index[99], GUILDS[0])
+        self.assertEqual(set(index.values()), set(GUILDS))
+        self.assertTrue({'rolechanger_conf.json.migrated', 'rolechanger_conf.json.migrated.1'} <= self.files())
+        with open(os.path.join(self.directory.name, 'rolechanger_conf.json.migrated'), encoding='utf-8') as file:
+            self.assertNotIn(99, [msg["message_id"] for guild in json.load(file)["guilds"] for msg in guild["messages"]])
+
+    def test_pruned_guild_stays_removed(self):
+        self.sharded(2)
+        self.sharded(4)
+        storage = ShardedJsonStorage(self.path, [shard_of(GUILDS[1], 4)], 4)
+        storage.load_index()
+        storage.guild_removed(GuildConfig(GUILDS[1]))
+        storage.close()
+
+        storage = UnshardedJsonStorage(self.path)
+        self.assertEqual(set(storage.load_index().values()), set(GUILDS) - {GUILDS[1]})
+        storage.close()
+
+    def test_refuses_to_start_empty(self):
+        storage = ShardedJsonStorage(self.path, [0], 2)
+        storage.load_index()
+        storage.close()
+        os.replace(self.path, f'{self.path}.migrated')
+        with self.assertRaises(RuntimeError):
+            UnshardedJsonStorage(self.path).load_index()
+
+        for name in self.files() - {'rolechanger_conf.json.migrated'}:
+            os.remove(os.path.join(self.directory.name, name))
+        with self.assertRaises(RuntimeError):
+            UnshardedJsonStorage(self.path).load_index()
+        self.assertNotIn('rolechanger_conf.json', self.files())
+
+
+if __name__ == '__main__':
+    unittest.main()